@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# ADSB Station — headless benchmark
+# ---------------------------------------------------------------------------------------------------------------------------------
+# Runs ADSB-Station.py on SDL's dummy video driver against a synthetic dump1090
+# feed served from localhost, and prints per-stage timings and trail memory
+# growth as JSON.
+#
+#       python3 ADSB-Bench.py --aircraft 300 --polls 120 --sim-hours 6 > bench_output.txt
+# ---------------------------------------------------------------------------------------------------------------------------------
+
+import os, json, math, time, random, argparse, threading, importlib.util, tracemalloc
+import http.server
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ["fetch_adsb", "preprocess", "draw_scene", "draw_background", "draw_top",
+          "draw_radar", "draw_trails", "labels_for", "draw_right", "draw_bottom"]
+
+def load_station():
+    """Import ADSB-Station.py as a module (its file name is not importable)."""
+    os.chdir(HERE)
+    spec = importlib.util.spec_from_file_location("adsb_station", os.path.join(HERE, "ADSB-Station.py"))
+    m = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(m)
+    return m
+
+# ---------------- Synthetic Feed ----------------
+class Feed:
+    """Synthetic traffic around the station.
+
+    Aircraft fly straight-ish tracks with slow turns, leave after a random
+    lifetime and are replaced by new hexes, so trails accumulate the way they
+    do over a day near a busy airport. Snapshots mix in the odd field formats
+    that pnum()/parse_alt()/parse_spd() have to cope with."""
+
+    def __init__(self, n, lat, lon, radius_nm=120.0, seed=1):
+        self.rng = random.Random(seed)
+        self.lat, self.lon, self.radius = lat, lon, radius_nm
+        self.next_hex = 0xA00000
+        self.t = 0.0
+        self.ac = [self._spawn() for _ in range(n)]
+
+    def _spawn(self):
+        r = self.rng; hx = self.next_hex; self.next_hex += 1
+        d = self.radius*math.sqrt(r.random()); b = r.uniform(0, 2*math.pi)
+        return {"hex": f"{hx:06x}", "flight": f"{r.choice(['BAW','DLH','RCH','EZY','UAL'])}{r.randint(1,9999)}",
+                "lat": self.lat + d*math.cos(b)/60.0,
+                "lon": self.lon + d*math.sin(b)/(60.0*max(0.2, math.cos(math.radians(self.lat)))),
+                "track": r.uniform(0, 360), "turn": r.uniform(-0.5, 0.5),
+                "gs": r.uniform(140, 480), "alt": r.choice([r.randint(1, 41)*1000, 0]),
+                "die": self.t + r.uniform(600, 7200),
+                "squawk": f"{r.randint(0, 7777):04d}", "mil": r.random() < 0.05}
+
+    def step(self, dt):
+        self.t += dt
+        for i, a in enumerate(self.ac):
+            if self.t >= a["die"]:
+                self.ac[i] = a = self._spawn()
+            a["track"] = (a["track"] + a["turn"]*dt) % 360
+            nm = a["gs"]*dt/3600.0; t = math.radians(a["track"])
+            a["lat"] += nm*math.cos(t)/60.0
+            a["lon"] += nm*math.sin(t)/(60.0*max(0.2, math.cos(math.radians(a["lat"]))))
+
+    def snapshot(self):
+        r = self.rng; out = []
+        for a in self.ac:
+            it = {"hex": ("ae" + a["hex"][2:]) if a["mil"] else a["hex"], "squawk": a["squawk"]}
+            k = r.random()
+            if k < 0.9:
+                it["flight"] = a["flight"] + "  "
+            alt = a["alt"]
+            it[r.choice(["alt_baro", "alt_baro", "altitude", "alt_geom"])] = (
+                "ground" if alt == 0 else r.choice([alt, str(alt), alt, "--"]))
+            k = r.random()
+            if k < 0.8:   it["gs"] = round(a["gs"], 1)
+            elif k < 0.9: it["tas"] = str(int(a["gs"]))
+            elif k < 0.95: it["mach"] = round(a["gs"]/661.0, 3)
+            else:         it["gs"] = r.choice(["", "nan", None])
+            if r.random() < 0.9: it[r.choice(["track", "track", "trak"])] = round(a["track"], 1)
+            if r.random() < 0.95: it["lat"], it["lon"] = a["lat"], a["lon"]
+            out.append(it)
+        return {"now": self.t, "messages": 0, "aircraft": out}
+
+def serve(feed):
+    """Serve the feed's current snapshot at http://127.0.0.1:<port>/data.json."""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(feed.snapshot()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers(); self.wfile.write(body)
+        def log_message(self, *a): pass
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+# ---------------- Timing ----------------
+def instrument(m, timings):
+    """Wrap the station's stage functions so every call records its duration."""
+    for name in STAGES:
+        orig = getattr(m, name, None)
+        if orig is None: continue
+        timings.setdefault(name, [])
+        def timed(*a, _f=orig, _n=name, **k):
+            t0 = time.perf_counter()
+            try: return _f(*a, **k)
+            finally: timings[_n].append(time.perf_counter() - t0)
+        setattr(m, name, timed)
+
+def summarize(samples):
+    if not samples: return {"n": 0}
+    s = sorted(samples); n = len(s)
+    pct = lambda q: s[min(n-1, int(q*n))]*1000.0
+    return {"n": n, "mean_ms": round(sum(s)/n*1000.0, 4), "p50_ms": round(pct(0.50), 4),
+            "p95_ms": round(pct(0.95), 4), "p99_ms": round(pct(0.99), 4), "max_ms": round(s[-1]*1000.0, 4)}
+
+# ---------------- Main ----------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Headless ADSB-Station benchmark")
+    ap.add_argument("--aircraft", type=int, default=200, help="aircraft in the synthetic feed")
+    ap.add_argument("--polls", type=int, default=60, help="polls in the live (HTTP) phase")
+    ap.add_argument("--frames", type=int, default=10, help="full frames drawn per poll")
+    ap.add_argument("--range", type=int, default=None, help="display range in NM (default: station default)")
+    ap.add_argument("--declutter", action="store_true", help="run with DECLUTTER on")
+    ap.add_argument("--sim-hours", type=float, default=2.0, help="simulated hours of trail history (soak phase)")
+    ap.add_argument("--soak-poll-secs", type=float, default=5.0, help="simulated seconds between soak polls")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="-", help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+
+    m = load_station()
+    m.init_display()
+    if args.range in m.ALLOWED_RANGES: m._range_idx = m.ALLOWED_RANGES.index(args.range)
+    if args.declutter: m.declutter = True
+    feed = Feed(args.aircraft, m.SITE_LAT, m.SITE_LON, seed=args.seed)
+    srv = serve(feed)
+    m.DUMP_URL = f"http://127.0.0.1:{srv.server_address[1]}/data.json"
+
+    timings = {}
+    instrument(m, timings)
+
+    # live phase: HTTP fetch -> preprocess -> frames, on the simulated clock
+    t0 = time.time(); wall = time.perf_counter()
+    for i in range(args.polls):
+        feed.step(m.POLL_SECS)
+        raw = m.fetch_adsb()
+        if raw is not None: m.preprocess(raw, now=t0 + feed.t)
+        for _ in range(args.frames): m.draw_scene()
+    live_wall = time.perf_counter() - wall
+    stages = {k: summarize(v) for k, v in timings.items()}
+
+    # soak phase: hours of trail history straight through preprocess; tracemalloc
+    # only runs here since it slows everything it traces
+    tracemalloc.start()
+    memory = []; mark = 0.0
+    soak_start = feed.t; wall = time.perf_counter()
+    while feed.t - soak_start < args.sim_hours*3600.0:
+        feed.step(args.soak_poll_secs)
+        m.preprocess(feed.snapshot()["aircraft"], now=t0 + feed.t)
+        if feed.t - soak_start >= mark:
+            cur, peak = tracemalloc.get_traced_memory()
+            mem = dict(getattr(m, "trail_mem", {}))
+            memory.append({"sim_hours": round((feed.t - soak_start)/3600.0, 3), "tracks": len(m.trail_hist),
+                           "trail_bytes": mem.get("bytes"), "py_bytes": cur, "py_peak_bytes": peak})
+            mark += 900.0
+    soak_wall = time.perf_counter() - wall
+    tracemalloc.stop()
+    frame_t = time.perf_counter(); m.draw_scene(); post_soak_frame = time.perf_counter() - frame_t
+    srv.shutdown()
+
+    report = {
+        "config": {k: getattr(args, k) for k in ("aircraft", "polls", "frames", "range", "declutter",
+                                                  "sim_hours", "soak_poll_secs", "seed")},
+        "screen": list(m.screen.get_size()),
+        "startup_ms": {k: round(v, 1) for k, v in m.startup.items()},
+        "numpy": m.np is not None if hasattr(m, "np") else False,
+        "stages": stages,
+        "live_wall_s": round(live_wall, 3), "soak_wall_s": round(soak_wall, 3),
+        "post_soak_frame_ms": round(post_soak_frame*1000.0, 3),
+        "memory": memory,
+        "counters": {k: dict(getattr(m, k)) for k in ("proj_stats", "text_stats", "trail_mem") if hasattr(m, k)},
+    }
+    out = json.dumps(report, indent=2)
+    if args.out == "-": print(out)
+    else:
+        with open(args.out, "w") as f: f.write(out + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -12,28 +12,83 @@
 # .- -.. ... -...    ... - .- - .. --- -.
 # ---------------------------------------------------------------------------------------------------------------------------------
 
-import math, time, json, urllib.request, collections, pygame, os
+import math, time, json, collections, pygame, os, bisect, socket
+import concurrent.futures, http.client, http.server, urllib.parse, urllib.request, re, io, struct, multiprocessing, sqlite3, zlib
+from multiprocessing import shared_memory
+from array import array
+_T0 = time.perf_counter()   # startup timing reference, see init_display()
+try:
+    import numpy as np  # optional: batch projection engine
+except ImportError:
+    np = None
+try:
+    import orjson as fastjson  # optional: faster data.json decoding
+except ImportError:
+    try:
+        import ujson as fastjson
+    except ImportError:
+        fastjson = None
 # --- Async Polling Thread (prevents render stutter) ---
 import threading
 
 _air_lock = threading.Lock()
+_air_cond = threading.Condition(_air_lock)   # notified on every aircraft.update()
 _stop_evt  = threading.Event()
 
+def poll_once():
+    raw = fetch_adsb()
+    if raw is not None: ingest(raw)   # None: receiver has nothing new
+
 def _poll_loop():
     """Poll dump1090 in the background and update `aircraft` safely."""
     while not _stop_evt.is_set():
         try:
-            data = preprocess(fetch_adsb())
-            with _air_lock:
-                aircraft[:] = data  
+            poll_once()
         except Exception:
             pass
+        metrics_tick()
         _stop_evt.wait(POLL_SECS)  
 
 # ---------------- Config ----------------
 DUMP_URL   = "http://localhost:8080/data.json"
 POLL_SECS  = 1.0
+DUMP_URLS  = []           # several receivers: polled concurrently, merged by hex (overrides DUMP_URL)
+FEED_TIMEOUT = 0.9        # per-feed request timeout; slower feeds are skipped for that poll
+FEED_HOLD_SEC = 10.0      # a slow feed's last good snapshot stays in the merge this long
+INGEST     = "http"       # "http" polls DUMP_URL; "sbs" / "beast" stream from dump1090's TCP outputs
+STREAM_HOST = "localhost"
+SBS_PORT, BEAST_PORT = 30003, 30005
+STREAM_PUBLISH_SECS = 0.25  # how often streamed updates are pushed to the display
+STREAM_STALE_SECS   = 60.0  # drop streamed aircraft not heard from for this long
+STREAM_BACKOFF      = (0.5, 30.0)  # reconnect delay: initial, max (doubles per failure)
+WORKER_PROCESS = False    # fetch/parse/preprocess in a separate process (Linux: needs fork)
+SHM_MAX_AIRCRAFT = 4096   # shared-memory capacity per buffer
+SHM_MAX_SAMPLES  = 400000 # trail samples per buffer (48 bytes each)
+RECORD_FILE   = ""        # append every fetched snapshot to this log ("" = off)
+RECORD_BLOCK_SEC = 60     # snapshots per compressed block (seek granularity)
+REPLAY_FILE   = ""        # play a recorded log instead of the live feed
+REPLAY_SPEED  = 1         # one of REPLAY_SPEEDS; [ / ] change it while running
+REPLAY_SPEEDS = (1, 2, 5, 10, 20, 50, 100)
+REPLAY_START  = 0         # seconds into the log, or an absolute epoch time
 FPS        = 60
+DIRTY_RECTS    = True   # redraw only changed regions and idle the frame rate
+IDLE_FPS       = 10     # tick rate when nothing has changed
+IDLE_AFTER_SEC = 0.25   # stay at FPS this long after input or new data
+DEAD_RECKON    = True   # move deltas along track/speed between position fixes
+DR_MAX_AGE_SEC = 10.0   # stop extrapolating a fix older than this
+DR_BLEND_SEC   = 1.0    # ease out the jump to a new fix over this long
+DR_SNAP_NM     = 2.0    # jump straight to a new fix this far from the prediction
+DR_FPS         = 20     # radar redraw rate while only dead reckoning moves deltas
+
+SERVE_PORT     = 0      # >0: headless server mode, see serve_main()
+SERVE_HOST     = "0.0.0.0"
+SERVE_FRAMES   = False  # also render off-screen for /frame.png and /frames.mjpg
+SERVE_FPS      = 5
+
+METRICS_ON     = False  # hot-path timers from startup (F3 HUD turns them on too)
+METRICS_FILE   = ""     # e.g. "/run/adsb/metrics.prom" (Prometheus text) or "...json"; "" = off
+METRICS_EVERY  = 10.0   # seconds between metrics file writes
+METRICS_WINDOW = 600    # samples per timer kept for the rolling percentiles
 
 # Palettes
 PALETTES = [
@@ -70,15 +125,25 @@ COL_FRAC = [0.02, 0.12, 0.34, 0.55, 0.70, 0.85, 0.93]  # RIGHT UI SPACING
 
 TRAIL_MAX_POINTS = 1500
 TRAIL_KEEP_SEC   = 86400
+TRAIL_BUDGET_MB  = 64     # global cap on trail sample memory; stalest tracks evicted first
 TRAIL_WIDTH      = 2  # TRAIL SIZE/WIDTH
 MAX_HOP_NM       = 6.0
 MAX_SAMPLE_GAP   = 14.0
 MAX_SEG_PX       = 1200
+TRAIL_LOD_NM     = (0.0, 0.05, 0.2, 0.8, 3.2)  # trail decimation tolerance per level of detail
+TRAIL_LOD_PX     = 2.0    # use the coarsest level whose tolerance stays under this on screen
 MIN_MOVE_NM      = 0.07
 FORCE_SAMPLE_EVERY_SEC = 2.5
+TRAIL_FADE_SEC   = 900.0  # segment age at which trails reach minimum alpha
+TRAIL_FADE_BUCKETS = 6
+TRAIL_DB         = ""     # SQLite file that keeps trails across restarts ("" = off)
+TRAIL_DB_FLUSH_SEC = 5.0  # batch interval for trail store writes
+TRAIL_DB_MAX_MB  = 256    # on-disk cap; oldest samples are compacted away first
 
 DECLUTTER_MIN_DIST = 28
 
+TEXT_CACHE_SIZE = 4096  # rendered text surfaces / widths kept in the LRU cache
+
 ALLOWED_RANGES = [5,8,10,12,16,20,24,30,32,40,50,60,80,100,120,160,200,240,320]
 RING_STEPS     = 6
 RADAR_INSET    = 24
@@ -88,18 +153,18 @@ DELTA_SIZE_PX = 12  # DELTA SIZE (RADAR)
 DELTA_LINE_W  = 2
 DELTA_DOT_R   = 2
 
-pygame.init()
-pygame.display.set_caption("ADSB-Station")
-FLAGS = pygame.FULLSCREEN | pygame.SCALED
-try:
-    screen = pygame.display.set_mode((0, 0), FLAGS)
-    if screen.get_width() == 0 or screen.get_height() == 0:
-        raise Exception("0-sized mode")
-except Exception:
-    info = pygame.display.Info()
-    screen = pygame.display.set_mode((info.current_w, info.current_h), FLAGS)
+FONT_FILES = ("TerminusTTF-4.49.3.ttf","TerminusTTF.ttf","Terminus.ttf")
+FONT_NAMES = ("JetBrains Mono","IBM Plex Mono","DejaVu Sans Mono","Menlo","Consolas","Monaco","Courier New")
+FONT_CACHE = os.path.expanduser("~/.cache/adsb-station/fonts.json")  # resolved system font paths
 
-clock  = pygame.time.Clock()
+# ---------------- Display Setup ----------------
+# Importing the module only defines things. main() calls init_display(),
+# which opens the window and loads the fonts. pygame's system font lookup
+# (SysFont) scans every installed font on first use, so the resolved path
+# is kept in FONT_CACHE and later starts open that file directly.
+startup = {}        # ms: display, fonts, first_frame (since import)
+screen = clock = None
+ui_font = ring_font = tag_font = None
 
 def load_ttf(path, size):
     try:
@@ -109,33 +174,149 @@ def load_ttf(path, size):
         pass
     return None
 
+def resolve_font(bold=False):
+    """(path, fake_bold) of the first installed FONT_NAMES face; path None means pygame's default."""
+    key = "bold" if bold else "regular"
+    try:
+        with open(FONT_CACHE) as f: path, fake = json.load(f)[key]
+        if path is None or os.path.exists(path): return path, fake
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    path, fake = None, False
+    for n in FONT_NAMES:
+        path = pygame.font.match_font(n, bold=bold)
+        if path:
+            fake = bold and path == pygame.font.match_font(n)
+            break
+    try:
+        try:
+            with open(FONT_CACHE) as f: cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        cache[key] = [path, fake]
+        os.makedirs(os.path.dirname(FONT_CACHE), exist_ok=True)
+        with open(FONT_CACHE + ".tmp", "w") as f: json.dump(cache, f)
+        os.replace(FONT_CACHE + ".tmp", FONT_CACHE)
+    except OSError:
+        pass
+    return path, fake
+
 def pick_font(size, bold=False):
-    for name in ("TerminusTTF-4.49.3.ttf","TerminusTTF.ttf","Terminus.ttf"):
+    for name in FONT_FILES:
         f = load_ttf(name, size)
         if f: return f
-    for n in ["JetBrains Mono","IBM Plex Mono","DejaVu Sans Mono","Menlo","Consolas","Monaco","Courier New"]:
-        try:
-            return pygame.font.SysFont(n, size, bold=bold)
-        except Exception:
-            pass
-    return pygame.font.SysFont(None, size, bold=bold)
-
-sh = screen.get_height()
-
-UI_PX     = max(22, int(sh*0.022))
-RING_PX   = max(20, int(sh*0.020))
-TAG_PX    = max(19, int(sh*0.018))
-ui_font   = pick_font(UI_PX)
-ring_font = pick_font(RING_PX, bold=True)
-tag_font  = pick_font(TAG_PX)
+    path, fake = resolve_font(bold)
+    try:
+        f = pygame.font.Font(path, size)
+    except Exception:
+        f = pygame.font.Font(None, size)
+    if fake: f.set_bold(True)
+    return f
+
+def init_display():
+    """Open the fullscreen window and load the fonts sized to it."""
+    global screen, clock, ui_font, ring_font, tag_font
+    t = time.perf_counter()
+    pygame.display.init(); pygame.font.init()
+    pygame.display.set_caption("ADSB-Station")
+    FLAGS = pygame.FULLSCREEN | pygame.SCALED
+    try:
+        screen = pygame.display.set_mode((0, 0), FLAGS)
+        if screen.get_width() == 0 or screen.get_height() == 0:
+            raise Exception("0-sized mode")
+    except Exception:
+        info = pygame.display.Info()
+        screen = pygame.display.set_mode((info.current_w, info.current_h), FLAGS)
+    clock = pygame.time.Clock()
+    startup["display"] = (time.perf_counter() - t)*1e3; t = time.perf_counter()
+
+    sh = screen.get_height()
+    UI_PX     = max(22, int(sh*0.022))
+    RING_PX   = max(20, int(sh*0.020))
+    TAG_PX    = max(19, int(sh*0.018))
+    ui_font   = pick_font(UI_PX)
+    ring_font = pick_font(RING_PX, bold=True)
+    tag_font  = pick_font(TAG_PX)
+    startup["fonts"] = (time.perf_counter() - t)*1e3
+
+# ---------------- Aircraft Store ----------------
+class Aircraft:
+    """One tracked aircraft; replaced whole, never edited, when its poll row changes."""
+    __slots__ = ("hex","flight","alt_show","spd_show","track","lat","lon","squawk",
+                 "range_nm","bearing","mil","gen","_row",
+                 "fix_t","x","y","vx","vy","ex","ey")   # dead reckoning, see dr_update()
+    FIELDS = __slots__[1:11]
+
+    def __init__(self, hx):
+        self.hex = hx; self.gen = 0; self._row = None
+        self.fix_t = self.x = self.y = None; self.vx = self.vy = self.ex = self.ey = 0.0
+
+class AircraftTable:
+    """Aircraft keyed by ICAO hex.
+
+    The poll thread applies each poll with update(); a changed row gets a fully
+    built new record stamped with the table generation, swapped in by a single
+    dict store, so a reader holding a record never sees half of an update. The
+    range-sorted order is rebuilt once per poll. Readers take snapshot() without
+    copying."""
+
+    def __init__(self):
+        self.recs = {}; self.gen = 0
+        self.order = (); self.mil_order = ()
+        self.removed = collections.deque(maxlen=600)   # (gen, hexes dropped by it), for deltas
+
+    def __len__(self): return len(self.order)
+
+    def snapshot(self, mil=False):
+        return self.mil_order if mil else self.order
+
+    def update(self, rows, now=None):
+        """Apply rows of (hex, *Aircraft.FIELDS) polled at `now`; hexes missing from `rows` are dropped."""
+        now = time.time() if now is None else now
+        with _air_lock:
+            gen = self.gen + 1
+            recs = self.recs
+            for row in rows:
+                old = recs.get(row[0])
+                if old is not None and old._row == row: continue
+                rec = Aircraft(row[0])
+                if old is not None:
+                    rec.fix_t, rec.x, rec.y, rec.vx, rec.vy, rec.ex, rec.ey = old.fix_t, old.x, old.y, old.vx, old.vy, old.ex, old.ey
+                moved = old is None or old._row[5:7] != row[5:7]
+                for f, v in zip(Aircraft.FIELDS, row[1:]): setattr(rec, f, v)
+                dr_update(rec, now, moved)
+                rec._row = row; rec.gen = gen
+                recs[row[0]] = rec
+            live = {row[0] for row in rows}
+            gone = [hx for hx in recs if hx not in live]
+            for hx in gone: del recs[hx]
+            self.removed.append((gen, gone))
+            self.order = tuple(sorted(recs.values(), key=lambda a: (a.range_nm is None, a.range_nm or 0.0)))
+            self.mil_order = tuple(a for a in self.order if a.mil)
+            self.gen = gen
+            _air_cond.notify_all()
+        return self.order
+
+    def install(self, order, gen):
+        """Adopt complete records already in range order, as stamped by another table at `gen`."""
+        with _air_lock:
+            recs = {a.hex: a for a in order}
+            gone = [hx for hx in self.recs if hx not in recs]
+            self.recs = recs
+            self.removed.append((gen, gone))
+            self.order = tuple(order)
+            self.mil_order = tuple(a for a in self.order if a.mil)
+            self.gen = gen
+            _air_cond.notify_all()
+        return self.order
 
 # ---------------- State ----------------
 trails_on = True
 declutter = False
 mil_only  = False
-aircraft  = []
-trail_hist = {}
-last_seen  = {}
+aircraft  = AircraftTable()
+trail_hist = {}                        # hex -> Trail
+last_seen  = collections.OrderedDict() # hex -> last poll time, oldest first
 
 radar_rect = pygame.Rect(0,0,0,0)
 right_rect = pygame.Rect(0,0,0,0)
@@ -153,13 +334,181 @@ _range_idx = ALLOWED_RANGES.index(32)
 def current_range_nm(): return ALLOWED_RANGES[_range_idx]
 
 def fetch_adsb():
+    """Aircraft list from the receiver(s), or None when the snapshot has not changed."""
+    if DUMP_URLS: return fetch_feeds(DUMP_URLS)
     try:
-        with urllib.request.urlopen(DUMP_URL, timeout=0.9) as r:
-            raw = json.loads(r.read().decode("utf-8","ignore"))
-            return raw.get("aircraft", []) if isinstance(raw, dict) else raw
+        snap = http_feed(DUMP_URL).get()
+        if snap is None: return None
+        if "trails" in snap and DUMP_URL not in _seeded:   # another station in serve mode
+            _seeded.add(DUMP_URL); seed_trails(urllib.parse.urljoin(DUMP_URL, snap["trails"]))
+        return snap.get("aircraft", [])
     except Exception:
         return []
 
+# ---------------- HTTP Fetch ----------------
+# One keep-alive connection per feed URL. Requests are conditional
+# (ETag / Last-Modified), and a body whose leading "now" matches the last
+# snapshot is dropped before it is decoded, so an unchanged snapshot costs
+# neither a JSON parse nor a preprocess() pass.
+_NOW_RE = re.compile(rb'\s*\{\s*"now"\s*:\s*([0-9.eE+-]+)')
+_http_feeds = {}
+
+def json_loads(body):
+    if fastjson is not None:
+        try: return fastjson.loads(body)
+        except ValueError: pass
+    return json.loads(body.decode("utf-8","ignore"))
+
+class HTTPFeed:
+    """Persistent conditional GETs of one data.json URL."""
+
+    def __init__(self, url, timeout):
+        u = urllib.parse.urlsplit(url)
+        self.cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+        self.host, self.port = u.hostname, u.port
+        self.path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        self.timeout = timeout; self.conn = None
+        self.etag = self.modified = self.now = None
+
+    def get(self):
+        """Decoded snapshot dict, or None for 304 / an unchanged `now`."""
+        hdrs = {}
+        if self.etag: hdrs["If-None-Match"] = self.etag
+        if self.modified: hdrs["If-Modified-Since"] = self.modified
+        for attempt in (0, 1):   # retry once: the server may have closed an idle keep-alive
+            if self.conn is None: self.conn = self.cls(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request("GET", self.path, headers=hdrs)
+                r = self.conn.getresponse(); body = r.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.conn.close(); self.conn = None
+                if attempt: raise
+        if r.status == 304: return None
+        if r.status != 200: raise OSError(f"HTTP {r.status} from {self.host}")
+        self.etag, self.modified = r.getheader("ETag"), r.getheader("Last-Modified")
+        m = _NOW_RE.match(body, 0, 64)
+        if m and self.now is not None and float(m.group(1)) == self.now: return None
+        raw = json_loads(body)
+        snap = raw if isinstance(raw, dict) else {"aircraft": raw}
+        now = pnum(snap.get("now"))
+        if now is not None and now == self.now: return None
+        self.now = now
+        return snap
+
+def http_feed(url, timeout=0.9):
+    f = _http_feeds.get(url)
+    if f is None: f = _http_feeds[url] = HTTPFeed(url, timeout)
+    return f
+
+# ---------------- Multi-Receiver ----------------
+# Each DUMP_URLS feed is fetched on its own pool thread. A poll waits at most
+# FEED_TIMEOUT, and only for fetches to feeds that have been answering in
+# time. A feed that missed the timeout or failed is still re-requested, but
+# in the background: its result is collected by a later poll, and it is not
+# re-requested while that fetch runs. One hung receiver therefore costs
+# the others nothing after its first timeout. Until it answers,
+# its last good snapshot stays in the merge for up to FEED_HOLD_SEC, aged
+# by how long ago it arrived, so its aircraft do not flicker out of the table.
+# Aircraft are merged by hex, freshest position first.
+feed_stats = {}   # url -> {"ok","unchanged","errors","timeouts","latency_ms","aircraft","msg_rate","last_ok"}
+_feed_pool = None
+_feed_busy = {}   # url -> future still running from an earlier poll
+_feed_last = {}   # url -> last snapshot, reused while the feed reports no change
+_feed_used = None # feeds that contributed to the last merge
+_feed_slow = set() # feeds whose last fetch failed or missed FEED_TIMEOUT
+
+def _feed_stat(url):
+    return feed_stats.setdefault(url, {"ok":0, "unchanged":0, "errors":0, "timeouts":0, "latency_ms":None,
+                                       "aircraft":0, "msg_rate":None, "last_ok":None, "_msgs":None})
+
+def fetch_feed(url):
+    """(snapshot dict or None if unchanged, seconds taken) for one receiver."""
+    t0 = time.perf_counter()
+    snap = http_feed(url, FEED_TIMEOUT).get()
+    return snap, time.perf_counter()-t0
+
+def _feed_done(url, fut):
+    """Record a finished fetch; returns "new", "same" or None (failed)."""
+    st = _feed_stat(url)
+    try:
+        snap, dt = fut.result()
+    except Exception:
+        st["errors"] += 1; _feed_slow.add(url)   # its last snapshot ages out via FEED_HOLD_SEC
+        return None
+    if dt <= FEED_TIMEOUT: _feed_slow.discard(url)
+    else: _feed_slow.add(url)
+    ms = dt*1000.0
+    st["latency_ms"] = ms if st["latency_ms"] is None else 0.8*st["latency_ms"] + 0.2*ms
+    st["last_ok"] = time.time()
+    if snap is None:
+        st["unchanged"] += 1
+        return "same" if url in _feed_last else None
+    st["ok"] += 1; st["aircraft"] = len(snap.get("aircraft", ()))
+    msgs, now = snap.get("messages"), snap.get("now", time.time())
+    if isinstance(msgs, (int, float)) and st["_msgs"] and now > st["_msgs"][1]:
+        st["msg_rate"] = max(0.0, (msgs - st["_msgs"][0])/(now - st["_msgs"][1]))
+    if isinstance(msgs, (int, float)): st["_msgs"] = (msgs, now)
+    _feed_last[url] = snap
+    return "new"
+
+def fetch_feeds(urls):
+    """Fetch every feed concurrently; the merged aircraft list, or None if nothing changed."""
+    global _feed_pool, _feed_used
+    if _feed_pool is None:
+        _feed_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(2, len(urls)), thread_name_prefix="feed")
+    futs = {}; answered = {}
+    for url in urls:
+        fut = _feed_busy.get(url)
+        if fut is not None:
+            if not fut.done(): continue          # still slow: don't wait on it again
+            del _feed_busy[url]; answered[url] = _feed_done(url, fut)
+        fut = _feed_pool.submit(fetch_feed, url)
+        if url in _feed_slow: _feed_busy[url] = fut   # collected by a later poll, never waited on
+        else: futs[fut] = url
+    done, pending = concurrent.futures.wait(futs, timeout=FEED_TIMEOUT) if futs else ((), ())
+    for fut in done:
+        answered[futs[fut]] = _feed_done(futs[fut], fut)
+    for fut in pending:
+        _feed_busy[futs[fut]] = fut; _feed_slow.add(futs[fut])
+        _feed_stat(futs[fut])["timeouts"] += 1
+    now = time.time(); held = []
+    for u in urls:
+        ok = feed_stats.get(u, {}).get("last_ok")
+        if u in _feed_last and ok is not None and (answered.get(u) or now - ok <= FEED_HOLD_SEC):
+            held.append((u, now - ok))
+    used = {u for u, _ in held}
+    if "new" not in answered.values() and used == _feed_used: return None
+    _feed_used = used
+    return merge_feeds([_feed_last[u] for u, _ in held], [age for _, age in held])
+
+def merge_feeds(snaps, held=None):
+    """One record per hex: fields from the freshest report win, gaps filled from the others.
+
+    Freshness is the position age (`seen_pos`) when there is a position, else
+    `seen`, plus how long ago the snapshot arrived (`held`, seconds per snap),
+    so overlapping coverage yields a single trail sample per poll."""
+    by_hex = {}
+    for snap, extra in zip(snaps, held or [0.0]*len(snaps)):
+        for it in snap.get("aircraft", ()):
+            hx = (it.get("hex") or "").lower()
+            if not hx: continue
+            has_pos = it.get("lat") is not None and it.get("lon") is not None
+            age = pnum(it.get("seen_pos") if has_pos else it.get("seen"))
+            by_hex.setdefault(hx, []).append(((not has_pos, age + extra if age is not None else 1e9), it))
+    out = []
+    for reps in by_hex.values():
+        if len(reps) == 1: out.append(reps[0][1]); continue
+        reps.sort(key=lambda r: r[0])
+        merged = {}
+        for _, it in reversed(reps): merged.update({k: v for k, v in it.items() if v is not None})
+        if reps[0][0][0]:
+            merged.pop("lat", None); merged.pop("lon", None)   # none had a position
+        else:
+            merged["lat"], merged["lon"] = reps[0][1]["lat"], reps[0][1]["lon"]
+        out.append(merged)
+    return out
+
 def pnum(v):
     if v is None: return None
     if isinstance(v,(int,float)): return float(v)
@@ -191,7 +540,7 @@ def gc_distance_nm(lat1,lon1,lat2,lon2):
     return R_NM*c
 
 def ll_to_range_brg(lat,lon):
-    if lat is None or lon is None: return (None,None)
+    if lat is None or lon is None or lat != lat or lon != lon: return (None,None)
     φ1,φ2=math.radians(SITE_LAT),math.radians(lat)
     dφ=math.radians(lat-SITE_LAT); dλ=math.radians(lon-SITE_LON)
     a = math.sin(dφ/2)**2 + math.cos(φ1)*math.cos(φ2)*math.sin(dλ/2)**2
@@ -200,6 +549,347 @@ def ll_to_range_brg(lat,lon):
     brg = great_circle_bearing(SITE_LAT,SITE_LON,lat,lon)
     return rnm, brg
 
+# ---------------- Trail History ----------------
+class Trail:
+    """Ring buffer of trail samples packed as doubles: t, lat, lon, range_nm, bearing, lod.
+
+    Grows until TRAIL_MAX_POINTS samples, then overwrites the oldest. `seq`
+    counts every sample ever appended so caches can tell what is new. `lod`
+    is a bitmask of the TRAIL_LOD_NM levels that keep the sample; level L keeps
+    a sample once it is TRAIL_LOD_NM[L] from the previous one it kept.
+    load() and extend() take rows with masks already set and leave `lod_xy`
+    to be recovered from them if append() is ever called afterwards.
+
+    Sample s lives in slot (s - s0) % TRAIL_MAX_POINTS, where s0 is the seq
+    of slot 0, fixed by load(). Readers that pass in a `seq` they read once
+    (seqs(), at(), oldest()) therefore stay consistent while another thread
+    appends: append() writes the sample before it bumps `seq`."""
+    __slots__ = ("buf", "head", "seq", "s0", "lod_xy")
+    W = 6
+
+    def __init__(self):
+        self.buf = array('d'); self.head = 0; self.seq = 0; self.s0 = 1
+        self.lod_xy = [None]*len(TRAIL_LOD_NM)
+
+    def __len__(self): return len(self.buf)//Trail.W
+
+    def nbytes(self): return len(self.buf)*self.buf.itemsize
+
+    def append(self, t, lat, lon, rnm, brg):
+        """Add a sample; returns the number of bytes newly allocated."""
+        if self.lod_xy is None: self._lod_last(self.rows())
+        a = math.radians(brg); x, y = rnm*math.sin(a), rnm*math.cos(a)
+        mask = 0
+        for lv, tol in enumerate(TRAIL_LOD_NM):
+            last = self.lod_xy[lv]
+            if last is None or math.hypot(x-last[0], y-last[1]) >= tol:
+                mask |= 1 << lv; self.lod_xy[lv] = (x, y)
+        if len(self.buf) < TRAIL_MAX_POINTS*Trail.W:
+            self.buf.extend((t, lat, lon, rnm, brg, mask))
+            self.seq += 1
+            return Trail.W*self.buf.itemsize
+        i = self.head*Trail.W
+        self.buf[i:i+Trail.W] = array('d', (t, lat, lon, rnm, brg, mask))
+        self.head = (self.head+1) % TRAIL_MAX_POINTS
+        self.seq += 1
+        return 0
+
+    def col(self, c, k=None):
+        """Column `c` of the newest `k` samples (all when None), oldest first."""
+        n = len(self); W = Trail.W
+        k = n if k is None else min(k, n)
+        p = (self.head - k) % n if n else 0
+        if p + k <= n: return self.buf[p*W+c:(p+k)*W:W].tolist()
+        return self.buf[p*W+c::W].tolist() + self.buf[c:(p+k-n)*W:W].tolist()
+
+    def last(self):
+        """(t, lat, lon) of the newest sample."""
+        i = ((self.head-1) % len(self))*Trail.W
+        return self.buf[i], self.buf[i+1], self.buf[i+2]
+
+    def times(self, k=None): return self.col(0, k)
+
+    def rbs(self, k=None): return list(zip(self.col(3, k), self.col(4, k)))
+
+    def rows(self, k=None):
+        """The newest `k` samples (all when None) as one flat array, oldest first."""
+        n = len(self); W = Trail.W
+        k = n if k is None else min(k, n)
+        p = (self.head - k) % n if n else 0
+        if p + k <= n: return self.buf[p*W:(p+k)*W]
+        return self.buf[p*W:] + self.buf[:(p+k-n)*W]
+
+    def load(self, rows, seq):
+        """Replace the contents with flat `rows` (oldest first) whose newest sample is `seq`."""
+        W = Trail.W; n = len(rows)//W
+        if n > TRAIL_MAX_POINTS: rows = rows[(n-TRAIL_MAX_POINTS)*W:]; n = TRAIL_MAX_POINTS
+        self.buf = rows; self.head = 0; self.seq = seq; self.s0 = seq - n + 1
+        self.lod_xy = None   # rebuilt by the next append(), if any
+
+    def extend(self, rows, seq):
+        """Append flat `rows` (oldest first, lod already set) whose newest sample is `seq`; returns bytes newly allocated."""
+        W = Trail.W; n = len(rows)//W
+        grow = max(0, min(n, TRAIL_MAX_POINTS - len(self)))
+        if grow: self.buf.extend(rows[:grow*W])
+        for i in range(grow, n):   # ring is full: overwrite the oldest
+            j = self.head*W
+            self.buf[j:j+W] = rows[i*W:i*W+W]
+            self.head = (self.head+1) % TRAIL_MAX_POINTS
+        self.seq = seq; self.lod_xy = None
+        return grow*W*self.buf.itemsize
+
+    def _lod_last(self, rows):
+        """Point lod_xy at the newest sample of `rows` each level keeps."""
+        W = Trail.W; self.lod_xy = [None]*len(TRAIL_LOD_NM)
+        for lv in range(len(TRAIL_LOD_NM)):
+            for i in range(len(rows)//W-1, -1, -1):
+                if int(rows[i*W+5]) & (1 << lv):
+                    r, a = rows[i*W+3], math.radians(rows[i*W+4])
+                    self.lod_xy[lv] = (r*math.sin(a), r*math.cos(a))
+                    break
+
+    def oldest(self, seq=None):
+        """Seq of the oldest sample in the ring while `seq` (default: the current one) is the newest."""
+        seq = self.seq if seq is None else seq
+        return max(self.s0, seq - TRAIL_MAX_POINTS + 1)
+
+    def seqs(self, lv, after=0, seq=None):
+        """Seqs after `after` up to `seq` (default: the newest) kept at LOD level `lv`, oldest first.
+
+        Level 0 keeps every sample, so it comes back as a range."""
+        seq = self.seq if seq is None else seq
+        base = max(after + 1, self.oldest(seq))
+        if lv == 0 or base > seq: return range(base, seq+1)
+        bit = 1 << lv
+        return [base+i for i, m in enumerate(self._span(5, base, seq-base+1)) if int(m) & bit]
+
+    def at(self, seqs, c):
+        """Column `c` for the given sample seqs (which must still be in the ring)."""
+        if isinstance(seqs, range) and seqs.step == 1: return self._span(c, seqs.start, len(seqs))
+        M = TRAIL_MAX_POINTS; W = Trail.W; s0 = self.s0; buf = self.buf
+        return [buf[((s-s0) % M)*W+c] for s in seqs]
+
+    def _span(self, c, first, k):
+        """Column `c` of the `k` consecutive samples from seq `first` on."""
+        M = TRAIL_MAX_POINTS; W = Trail.W; p = (first - self.s0) % M
+        if p + k <= M: return self.buf[p*W+c:(p+k)*W:W].tolist()
+        return self.buf[p*W+c::W].tolist() + self.buf[c:(p+k-M)*W:W].tolist()
+
+# Expiry and the memory budget both walk `last_seen` from its oldest end, so
+# a poll only touches the tracks it actually removes.
+trail_mem = {"bytes":0, "samples":0, "expired":0, "evicted":0}
+
+def trail_append(hx, t, lat, lon, rb=None):
+    tr = trail_hist.get(hx)
+    if tr is None: tr = trail_hist[hx] = Trail()
+    rnm, brg = rb or ll_to_range_brg(lat, lon)
+    trail_mem["bytes"] += tr.append(t, lat, lon, rnm, brg)
+    if _db_path: _db_queue.append((hx, t, lat, lon))
+
+def trail_drop(hx):
+    tr = trail_hist.pop(hx, None)
+    if tr is not None: trail_mem["bytes"] -= tr.nbytes()
+    _trail_px.pop(hx, None)
+
+def trail_seen(hx, now):
+    last_seen[hx] = now; last_seen.move_to_end(hx)
+
+def trail_expire(now):
+    """Drop tracks unseen for TRAIL_KEEP_SEC, then the stalest ones while over TRAIL_BUDGET_MB."""
+    cutoff = now - TRAIL_KEEP_SEC
+    while last_seen:
+        hx, ts = next(iter(last_seen.items()))
+        if ts >= cutoff: break
+        last_seen.popitem(last=False)
+        if hx in trail_hist: trail_drop(hx); trail_mem["expired"] += 1
+    budget = TRAIL_BUDGET_MB*1024*1024
+    while trail_mem["bytes"] > budget and last_seen:
+        hx, _ = last_seen.popitem(last=False)
+        if hx in trail_hist: trail_drop(hx); trail_mem["evicted"] += 1
+    trail_mem["samples"] = trail_mem["bytes"]//(Trail.W*8)
+    trail_mem["tracks"] = len(trail_hist)
+
+# ---------------- Trail Store ----------------
+# With TRAIL_DB set, every trail sample is also queued for an append-only
+# SQLite table. A writer thread drains the queue every TRAIL_DB_FLUSH_SEC in
+# one transaction, drops samples older than TRAIL_KEEP_SEC and trims the
+# oldest rows while the file is over TRAIL_DB_MAX_MB. On startup only
+# `last_seen` is restored; a track's samples are read back the first time
+# it appears in a poll, so a restart costs one indexed query per aircraft
+# actually on screen. All of this runs on the ingest side, never in render.
+_db_path  = ""
+_db_queue = collections.deque(maxlen=1_000_000)
+_db_lazy  = set()      # hexes with stored samples not yet loaded
+_db_read  = None
+_db_thread = None
+db_stats  = {"written":0, "loaded":0, "compacted":0, "bytes":0}
+
+def _db_connect(path):
+    con = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+def trail_store_open(path=None, now=None):
+    """Open (or create) the trail store and restore `last_seen` from it."""
+    global _db_path, _db_read, _db_thread
+    path = path or TRAIL_DB
+    if not path: return False
+    now = time.time() if now is None else now
+    try:
+        con = _db_connect(path)
+        if not con.execute("SELECT 1 FROM sqlite_master WHERE name='samples'").fetchone():
+            con.execute("PRAGMA auto_vacuum=INCREMENTAL"); con.execute("VACUUM")
+        con.execute("CREATE TABLE IF NOT EXISTS samples (hex TEXT NOT NULL, t REAL NOT NULL, lat REAL, lon REAL)")
+        con.execute("CREATE INDEX IF NOT EXISTS samples_hex_t ON samples (hex, t)")
+        seen = con.execute("SELECT hex, MAX(t) FROM samples GROUP BY hex").fetchall()
+    except sqlite3.Error as e:
+        print("trail store:", e); return False
+    for hx, ts in sorted(seen, key=lambda r: r[1]):
+        if ts >= now - TRAIL_KEEP_SEC:
+            last_seen[hx] = ts; _db_lazy.add(hx)
+    _db_path, _db_read = path, con
+    _db_thread = threading.Thread(target=_db_writer, daemon=True, name="trail-store")
+    _db_thread.start()
+    return True
+
+def trail_store_load(hx, now):
+    """Rebuild `hx`'s trail from the store (newest TRAIL_MAX_POINTS within TRAIL_KEEP_SEC)."""
+    _db_lazy.discard(hx)
+    try:
+        rows = _db_read.execute("SELECT t, lat, lon FROM samples WHERE hex=? AND t>=? ORDER BY t DESC LIMIT ?",
+                                (hx, now - TRAIL_KEEP_SEC, TRAIL_MAX_POINTS)).fetchall()
+    except sqlite3.Error:
+        return
+    if not rows or hx in trail_hist: return
+    rows.reverse()
+    tr = trail_hist[hx] = Trail()
+    rbs = batch_range_brg([r[1] for r in rows], [r[2] for r in rows])
+    for (t, lat, lon), (rnm, brg) in zip(rows, rbs):
+        trail_mem["bytes"] += tr.append(t, lat, lon, rnm, brg)
+    db_stats["loaded"] += len(rows)
+
+def trail_store_flush(con):
+    """Write everything queued so far in a single transaction."""
+    batch = []
+    while _db_queue:
+        try: batch.append(_db_queue.popleft())
+        except IndexError: break
+    if batch:
+        with con: con.executemany("INSERT INTO samples VALUES (?,?,?,?)", batch)
+        db_stats["written"] += len(batch)
+
+def trail_store_compact(con, now):
+    """Drop expired samples, then the oldest quarter at a time while over TRAIL_DB_MAX_MB."""
+    with con:
+        cur = con.execute("DELETE FROM samples WHERE rowid < COALESCE((SELECT rowid FROM samples WHERE t>=? ORDER BY rowid LIMIT 1),"
+                          " (SELECT MAX(rowid)+1 FROM samples))", (now - TRAIL_KEEP_SEC,))
+        db_stats["compacted"] += cur.rowcount
+    for _ in range(8):
+        used = con.execute("PRAGMA page_count").fetchone()[0] - con.execute("PRAGMA freelist_count").fetchone()[0]
+        db_stats["bytes"] = used*con.execute("PRAGMA page_size").fetchone()[0]
+        if db_stats["bytes"] <= TRAIL_DB_MAX_MB*1024*1024: break
+        with con:
+            cur = con.execute("DELETE FROM samples WHERE rowid < (SELECT MIN(rowid) + (MAX(rowid)-MIN(rowid))/4 + 1 FROM samples)")
+            db_stats["compacted"] += cur.rowcount
+    con.executescript("PRAGMA incremental_vacuum")  # execute() would free only one page
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def _db_writer():
+    con = _db_connect(_db_path); next_compact = 0.0
+    while True:
+        stopping = _stop_evt.wait(TRAIL_DB_FLUSH_SEC)
+        try:
+            trail_store_flush(con)
+            if stopping or time.time() >= next_compact:
+                trail_store_compact(con, time.time()); next_compact = time.time() + 600
+        except sqlite3.Error as e:
+            print("trail store:", e)
+        if stopping: break
+    con.close()
+
+def trail_store_close():
+    if _db_thread is not None: _db_thread.join(timeout=10.0)
+    if _db_read is not None: _db_read.close()
+
+# ---------------- Trail Projection Cache ----------------
+# Range/bearing is computed once per trail sample when preprocess() appends it;
+# pixel coords are derived per aircraft and reused until the view changes
+# (range index, layout or window size), which calls invalidate_projection().
+_trail_px  = {}   # hex -> [seq, pts] pixel cache for the current view
+proj_stats = {"hits":0, "misses":0, "invalidations":0}
+
+def invalidate_projection():
+    _trail_px.clear(); invalidate_trails()
+    proj_stats["invalidations"] += 1
+
+def _rb_to_px(rb, rng, cx, cy):
+    rnm, brg = rb
+    if rnm is None or brg is None or not rnm <= rng or brg != brg: return None
+    return bearing_to_xy(cx, cy, int(nm_to_px(rnm, rng, radius_px)), brg)
+
+def trail_lod():
+    """Coarsest TRAIL_LOD_NM level that stays under TRAIL_LOD_PX at the current scale."""
+    px_per_nm = radius_px/current_range_nm()
+    return max(lv for lv, tol in enumerate(TRAIL_LOD_NM) if tol*px_per_nm <= TRAIL_LOD_PX)
+
+def trail_points(hx):
+    """(seqs, pts) for a trail at the current LOD; pts are pixel coords or None (break).
+
+    Only samples appended since the cached copy are projected."""
+    tr = trail_hist.get(hx)
+    if not tr: return [], []
+    seq = tr.seq   # read once: the poll thread may append while we project
+    ent = _trail_px.get(hx)
+    if ent and ent[0] == seq:
+        proj_stats["hits"] += 1
+        return ent[1], ent[2]
+    proj_stats["misses"] += 1
+    rng = current_range_nm(); cx, cy = center
+    lv = trail_lod()
+    seqs, pts = (ent[1], ent[2]) if ent else ([], [])
+    new = tr.seqs(lv, ent[0] if ent else 0, seq)
+    if new:
+        rbs = list(zip(tr.at(new, 3), tr.at(new, 4)))
+        seqs.extend(new); pts.extend(batch_rb_to_px(rbs, rng, cx, cy))
+    gone = bisect.bisect_left(seqs, tr.oldest(seq))
+    if gone: del seqs[:gone]; del pts[:gone]
+    _trail_px[hx] = [seq, seqs, pts]
+    return seqs, pts
+
+# ---------------- Batch Projection ----------------
+# NumPy versions of ll_to_range_brg()/bearing_to_xy() for a whole poll or trail.
+# Small batches (and hosts without NumPy) use the scalar functions above.
+BATCH_MIN = 16
+
+def batch_range_brg(lats, lons):
+    """[(range_nm, bearing)] for parallel lat/lon sequences; (None,None) where missing."""
+    if np is None or len(lats) < BATCH_MIN:
+        return [ll_to_range_brg(la, lo) for la, lo in zip(lats, lons)]
+    la = np.array(lats, dtype=float); lo = np.array(lons, dtype=float)
+    φ1 = math.radians(SITE_LAT); φ2 = np.radians(la)
+    dφ = np.radians(la-SITE_LAT); dλ = np.radians(lo-SITE_LON)
+    a = np.sin(dφ/2)**2 + math.cos(φ1)*np.cos(φ2)*np.sin(dλ/2)**2
+    rnm = R_NM*2*np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    y = np.sin(dλ)*np.cos(φ2)
+    x = math.cos(φ1)*np.sin(φ2) - math.sin(φ1)*np.cos(φ2)*np.cos(dλ)
+    brg = (np.degrees(np.arctan2(y, x)) + 360) % 360
+    ok = ~(np.isnan(la) | np.isnan(lo))
+    return [(r, b) if k else (None, None) for r, b, k in zip(rnm.tolist(), brg.tolist(), ok.tolist())]
+
+def batch_rb_to_px(rbs, rng, cx, cy):
+    """Screen (x,y) for [(range_nm, bearing)]; None where missing or beyond `rng`."""
+    if np is None or len(rbs) < BATCH_MIN:
+        return [_rb_to_px(p, rng, cx, cy) for p in rbs]
+    a = np.array(rbs, dtype=float).reshape(-1, 2)
+    rnm, brg = a[:,0], a[:,1]
+    ok = (rnm <= rng) & ~np.isnan(brg)
+    rr = np.trunc(np.where(ok, rnm, 0.0)/rng*radius_px)
+    ang = np.radians(90 - np.where(ok, brg, 0.0))
+    xs = np.rint(cx + rr*np.cos(ang)).astype(int).tolist()
+    ys = np.rint(cy - rr*np.sin(ang)).astype(int).tolist()
+    return [(x, y) if k else None for x, y, k in zip(xs, ys, ok.tolist())]
+
 def mil_heuristic(hexid):
     if not hexid: return False
     h = hexid.upper()
@@ -222,11 +912,51 @@ def layout(w,h):
     radar_rect = pygame.Rect(usable.x, usable.y, usable.w-right_w, usable.h)
     s = min(radar_rect.w, radar_rect.h)
     radar_rect.size=(s,s)
+    geom=(center, radius_px)
     center=(radar_rect.left+s//2, radar_rect.top+s//2)
     radius_px = radar_rect.w//2-(RADAR_INSET+COMPASS_GUTTER)
+    if geom!=(center, radius_px): invalidate_projection()
+
+# ---------------- Text Cache ----------------
+# Shared LRU of rendered text surfaces, measured widths and clipped strings,
+# keyed by font and text so unchanged labels are never re-rendered.
+_text_cache = collections.OrderedDict()
+text_stats  = {"hits":0, "misses":0, "evictions":0}
+
+def _text_cached(key, make):
+    v = _text_cache.get(key)
+    if v is not None:
+        _text_cache.move_to_end(key); text_stats["hits"] += 1
+        return v
+    text_stats["misses"] += 1
+    v = _text_cache[key] = make()
+    while len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False); text_stats["evictions"] += 1
+    return v
+
+def render_text(font, txt, color):
+    return _text_cached(("r", font, txt, color), lambda: font.render(txt, True, color))
+
+def text_width(font, txt):
+    return _text_cached(("w", font, txt), lambda: font.size(txt)[0])
+
+def clip_text(font, txt, maxpx):
+    """Longest prefix of `txt` (with an ellipsis) that fits in `maxpx`."""
+    if not txt: txt="--"
+    def make():
+        if text_width(font, txt) <= maxpx: return txt
+        lo, hi = 0, len(txt)
+        while lo < hi:
+            mid = (lo+hi)//2
+            if text_width(font, txt[:mid] + "…") <= maxpx:
+                lo = mid + 1
+            else:
+                hi = mid
+        return txt[:max(1,hi-1)] + "…"
+    return _text_cached(("c", font, txt, maxpx), make)
 
 # ---------------- Drawing ----------------
-def blit(font, txt, color, pos): screen.blit(font.render(txt, True, color), pos)
+def blit(font, txt, color, pos): screen.blit(render_text(font, txt, color), pos)
 
 #def draw_top():
 #    pygame.draw.rect(screen, C("BG"), topbar_rect)
@@ -235,9 +965,10 @@ def blit(font, txt, color, pos): screen.blit(font.render(txt, True, color), pos)
 def draw_top():
     pygame.draw.rect(screen, C("BG"), topbar_rect)
     left  = f"STN: {SITE_NAME}   POS: {SITE_LAT:.5f}, {SITE_LON:.5f}   HDG REF: N-UP"
-    right = f"LCL: {time.strftime('%H:%M:%S')}"
+    right = f"LCL: {time.strftime('%H:%M:%S')}" if _replay is None else \
+            f"REPLAY {_replay.speed}x: {time.strftime('%H:%M:%S', time.localtime(data_clock()))}"
     blit(ui_font, left,  C("MINT"), (12, (topbar_rect.h - ui_font.get_height()) // 2))
-    rx = topbar_rect.right - 12 - ui_font.size(right)[0]
+    rx = topbar_rect.right - 12 - text_width(ui_font, right)
     blit(ui_font, right, C("MINT"), (rx, (topbar_rect.h - ui_font.get_height()) // 2))
 
 #def draw_bottom():
@@ -258,67 +989,208 @@ def draw_bottom():
     blit(ui_font, left, C("MINT"), (12, bottbar_rect.y + (bottbar_rect.h - ui_font.get_height()) // 2))
 
     # Right-aligned text
-    rx = bottbar_rect.right - 12 - ui_font.size(right)[0]
+    rx = bottbar_rect.right - 12 - text_width(ui_font, right)
     blit(ui_font, right, C("MINT"), (rx, bottbar_rect.y + (bottbar_rect.h - ui_font.get_height()) // 2))
 
 
-def draw_badges():
+def draw_badges(dst=None):
     """Draw static radar badges: DECLUTTER / TRAILS OFF / MILITARY."""
+    if dst is None: dst = screen
     pad = 10
     x, y = radar_rect.x+pad, radar_rect.y+pad
     if declutter:
-        tx = ui_font.render("DECLUTTER", True, BADGE_GOLD)
+        tx = render_text(ui_font, "DECLUTTER", BADGE_GOLD)
         badge = pygame.Rect(x, y, tx.get_width()+12, tx.get_height()+6)
-        pygame.draw.rect(screen, C("BG"), badge)
-        pygame.draw.rect(screen, BADGE_GOLD, badge, 1, border_radius=6)
-        screen.blit(tx, (badge.x+6, badge.y+3))
+        pygame.draw.rect(dst, C("BG"), badge)
+        pygame.draw.rect(dst, BADGE_GOLD, badge, 1, border_radius=6)
+        dst.blit(tx, (badge.x+6, badge.y+3))
         y += badge.height + 6
     if not trails_on:
-        tx = ui_font.render("TRAILS OFF", True, BADGE_RED)
+        tx = render_text(ui_font, "TRAILS OFF", BADGE_RED)
         badge = pygame.Rect(x, y, tx.get_width()+12, tx.get_height()+6)
-        pygame.draw.rect(screen, C("BG"), badge)
-        pygame.draw.rect(screen, BADGE_RED, badge, 1, border_radius=6)
-        screen.blit(tx, (badge.x+6, badge.y+3))
+        pygame.draw.rect(dst, C("BG"), badge)
+        pygame.draw.rect(dst, BADGE_RED, badge, 1, border_radius=6)
+        dst.blit(tx, (badge.x+6, badge.y+3))
         y += badge.height + 6
     if mil_only:
-        tx = ui_font.render("MILITARY", True, BADGE_CYAN)
+        tx = render_text(ui_font, "MILITARY", BADGE_CYAN)
         badge = pygame.Rect(x, y, tx.get_width()+12, tx.get_height()+6)
-        pygame.draw.rect(screen, C("BG"), badge)
-        pygame.draw.rect(screen, BADGE_CYAN, badge, 1, border_radius=6)
-        screen.blit(tx, (badge.x+6, badge.y+3))
+        pygame.draw.rect(dst, C("BG"), badge)
+        pygame.draw.rect(dst, BADGE_CYAN, badge, 1, border_radius=6)
+        dst.blit(tx, (badge.x+6, badge.y+3))
 
-def draw_rings():
+def draw_rings(dst=None):
+    if dst is None: dst=screen
     cx,cy=center
     outer=radius_px
-    pygame.draw.circle(screen,C("RINGS"),(cx,cy),outer,RING_W)
+    pygame.draw.circle(dst,C("RINGS"),(cx,cy),outer,RING_W)
     for i in range(1,RING_STEPS):
-        pygame.draw.circle(screen,C("RINGS"),(cx,cy),int(outer*(i/RING_STEPS)),1)
+        pygame.draw.circle(dst,C("RINGS"),(cx,cy),int(outer*(i/RING_STEPS)),1)
 
     on=int(outer*((RING_STEPS-1)/RING_STEPS))
     tick=max(8,int(nm_to_px(0.035*current_range_nm(),current_range_nm(),on)))
     for b in range(0,360,15):
         x1,y1=bearing_to_xy(cx,cy,on-2,b); x2,y2=bearing_to_xy(cx,cy,on-2-tick,b)
-        pygame.draw.line(screen,C("RINGS"),(x1,y1),(x2,y2),1)
+        pygame.draw.line(dst,C("RINGS"),(x1,y1),(x2,y2),1)
 
     step = current_range_nm() // RING_STEPS
     for i in range(1,RING_STEPS+1):
         r=int(outer*(i/RING_STEPS))
-        t=ring_font.render(f"{i*step} nm",True,C("RINGS"))
+        t=render_text(ring_font,f"{i*step} nm",C("RINGS"))
         x,y=bearing_to_xy(cx,cy,r-8,90)
-        screen.blit(t,(x - t.get_width(), y - t.get_height()//2))
+        dst.blit(t,(x - t.get_width(), y - t.get_height()//2))
 
     nesw_r=outer+COMPASS_GUTTER-4
     for b,ch in [(0,'N'),(90,'E'),(180,'S'),(270,'W')]:
-        t=ring_font.render(ch,True,C("RINGS")); x,y=bearing_to_xy(cx,cy,nesw_r,b)
-        screen.blit(t,(x-t.get_width()//2,y-t.get_height()//2))
+        t=render_text(ring_font,ch,C("RINGS")); x,y=bearing_to_xy(cx,cy,nesw_r,b)
+        dst.blit(t,(x-t.get_width()//2,y-t.get_height()//2))
 
     mid=int(outer*(RING_STEPS-1)/RING_STEPS)
     for ang,val in [(315,"315"),(45,"45"),(135,"135"),(225,"225")]:
-        t=ring_font.render(val,True,C("RINGS"))
+        t=render_text(ring_font,val,C("RINGS"))
         x,y=bearing_to_xy(cx,cy,mid,ang)
-        screen.blit(t,(x-t.get_width()//2,y-t.get_height()//2))
+        dst.blit(t,(x-t.get_width()//2,y-t.get_height()//2))
+
+# ---------------- Static Background ----------------
+# Fill, panel borders, rings, compass labels and badges only change with the
+# range, palette, window size or a toggle, so they are drawn once to a cached
+# surface and blitted in a single call each frame.
+_bg_surf = None
+_bg_key  = None
+
+def invalidate_background():
+    global _bg_key
+    _bg_key = None
+
+def draw_background(areas=None):
+    global _bg_surf, _bg_key
+    key = (_range_idx, pal_ix, screen.get_size(), declutter, trails_on, mil_only)
+    if key != _bg_key:
+        _bg_surf = pygame.Surface(screen.get_size()).convert()
+        _bg_surf.fill(C("BG"))
+        pygame.draw.rect(_bg_surf,C("NEON"),radar_rect,OUTLINE_W,border_radius=8)
+        pygame.draw.rect(_bg_surf,C("NEON"),right_rect,OUTLINE_W,border_radius=8)
+        draw_rings(_bg_surf); draw_badges(_bg_surf)
+        _bg_key = key
+    if areas is None: screen.blit(_bg_surf, (0,0))
+    else:
+        for r in areas: screen.blit(_bg_surf, r, r)
+
+# ---------------- Trail Layer ----------------
+# Trails live on a persistent SRCALPHA layer. Each frame only the segments
+# appended since the last draw are added; the layer is wiped and redrawn when
+# the view changes (see invalidate_projection), the palette or MIL filter
+# changes, or the fade advances to the next age bucket. Every tracked aircraft
+# keeps its trail on the layer, even while it has no position or is out of
+# range. A trail whose hex has left `aircraft` or `trail_hist` is cleared by
+# the next rebuild, and departures force at most one rebuild per poll.
+_trail_layer  = None
+_trail_key    = None   # (size, palette, MIL filter, fade epoch)
+_trail_drawn  = {}     # hex -> (trail, seq already on the layer)
+_trail_dirty  = True
+_trail_stale  = False  # the layer still shows a trail that has gone
+_trail_pruned = None   # aircraft.gen of the last rebuild
+
+def invalidate_trails():
+    global _trail_dirty
+    _trail_dirty = True
+
+def trail_fade_epoch(now):
+    return int(now*TRAIL_FADE_BUCKETS/TRAIL_FADE_SEC)
+
+def _trail_alpha(age):
+    b = min(TRAIL_FADE_BUCKETS-1, max(0, int(age*TRAIL_FADE_BUCKETS/TRAIL_FADE_SEC)))
+    t = 1 - b/(TRAIL_FADE_BUCKETS-1)
+    return 60+int(180*(t*t))
+
+def _draw_trail(hx, after, now):
+    """Draw the segments of a trail newer than seq `after` (all of them when None).
+
+    Consecutive segments in the same fade bucket go out as one polyline."""
+    tr = trail_hist.get(hx)
+    seqs, pts = trail_points(hx)
+    if not tr or len(pts) < 2: return
+    i0 = 0 if after is None else max(0, bisect.bisect_right(seqs, after)-1)
+    seqs = seqs[i0:]; pts = pts[i0:]
+    ts = tr.at(seqs, 0)
+    r,g,b = C("TRAIL")
+    run = []; run_a = None
+    for i in range(1, len(pts)):
+        p, q = pts[i-1], pts[i]
+        if p is None or q is None or math.hypot(q[0]-p[0], q[1]-p[1]) > MAX_SEG_PX:
+            a = None
+        else:
+            a = _trail_alpha(now-ts[i])
+        if a != run_a or a is None:
+            if len(run) > 1: pygame.draw.lines(_trail_layer, (r,g,b,run_a), False, run, TRAIL_WIDTH)
+            run = [p] if a is not None else []; run_a = a
+        if a is not None: run.append(q)
+    if len(run) > 1: pygame.draw.lines(_trail_layer, (r,g,b,run_a), False, run, TRAIL_WIDTH)
+
+def draw_trails(hexes):
+    """Bring the trail layer up to date for `hexes` and blit it."""
+    global _trail_layer, _trail_key, _trail_dirty, _trail_drawn, _trail_stale, _trail_pruned
+    now = data_clock()
+    key = (screen.get_size(), pal_ix, mil_only, trail_fade_epoch(now))
+    if _trail_layer is None or _trail_layer.get_size() != key[0]:
+        _trail_layer = pygame.Surface(key[0], pygame.SRCALPHA); _trail_dirty = True
+    shown = {hx: trail_hist.get(hx) for hx in hexes}
+    if not _trail_stale:
+        _trail_stale = any(shown.get(hx) is not tr for hx, (tr, _) in _trail_drawn.items())
+    if _trail_dirty or key != _trail_key or (_trail_stale and aircraft.gen != _trail_pruned):
+        _trail_layer.fill((0,0,0,0)); _trail_drawn = {}
+        _trail_key = key; _trail_dirty = _trail_stale = False; _trail_pruned = aircraft.gen
+    for hx, tr in shown.items():
+        if not tr: continue
+        drawn = _trail_drawn.get(hx)
+        done = drawn[1] if drawn and drawn[0] is tr else None
+        if done == tr.seq: continue
+        _draw_trail(hx, done, now)
+        _trail_drawn[hx] = (tr, tr.seq)
+    screen.blit(_trail_layer, (0,0))
+
+# The table is a window onto aircraft.snapshot(), which is already sorted
+# once per poll. `table_top` is the first row shown; the arrow, PgUp/PgDn,
+# Home and End keys move it. Each row is rendered once to its own surface
+# and reused until that row's text, the column widths or the palette change.
+# A frame therefore blits one surface per visible row and renders only the
+# rows that changed.
+table_top  = 0
+table_page = 1        # rows that fit, as of the last draw
+_row_surfs = {}       # hex -> (key, surface)
+
+def table_fields(ac):
+    return (("MIL" if ac.mil else "--"),
+            (ac.flight or "--"),
+            (ac.hex or "--").upper(),
+            (ac.alt_show if ac.alt_show else "--"),
+            (ac.spd_show if ac.spd_show else "--"),
+            (str(int((ac.track if ac.track is not None else ac.bearing)%360)) if (ac.track is not None or ac.bearing is not None) else "--"),
+            (ac.squawk or "--"))
+
+def row_surface(ac, offs, colw, row_h):
+    """`ac`'s table row as a transparent surface, re-rendered only when its text or the layout changed."""
+    fields = table_fields(ac)
+    key = (fields, offs, colw, row_h, pal_ix)
+    hit = _row_surfs.get(ac.hex)
+    if hit is not None and hit[0] == key: return hit[1]
+    surf = pygame.Surface((offs[-1]+colw[-1], row_h), pygame.SRCALPHA)
+    for c,txt in enumerate(fields):
+        color = WHITE if (c==1) else C("RINGS")
+        clipped = clip_text(ui_font, str(txt), colw[c])
+        surf.blit(render_text(ui_font,clipped,color),(offs[c],ROW_PAD_Y))
+    _row_surfs[ac.hex] = (key, surf)
+    return surf
+
+def table_scroll(delta=None, to=None):
+    """Move the table window by `delta` rows, or to row `to` (-1 = last page)."""
+    global table_top
+    n = len(aircraft.snapshot(mil_only))
+    top = table_top + (delta or 0) if to is None else (n if to < 0 else to)
+    table_top = max(0, min(top, n - table_page))
 
 def draw_right():
+    global table_top, table_page
     x,y,w,h=right_rect
     pad=12
     inner=right_rect.inflate(-pad*2,-pad*2)
@@ -330,47 +1202,29 @@ def draw_right():
     uy=inner.y+HEADER_PAD_Y+ui_font.get_height()+2
     pygame.draw.line(screen,C("RINGS"),(inner.x,uy),(inner.right,uy),1)
 
-    rows=[a for a in aircraft if (not mil_only or a.get('_mil'))]
-    rows.sort(key=lambda a: (a.get('_range_nm') is None, a.get('_range_nm') or 0.0))
+    rows=aircraft.snapshot(mil_only)
     row_y=uy+8; row_h=ui_font.get_height()+ROW_PAD_Y*2
 
-    def clip_txt(txt, maxpx, color):
-        if not txt: txt="--"
-        surf = ui_font.render(txt, True, color)
-        if surf.get_width() <= maxpx: return txt
-        s = txt
-        lo, hi = 0, len(s)
-        while lo < hi:
-            mid = (lo+hi)//2
-            piece = s[:mid] + "…"
-            if ui_font.render(piece, True, color).get_width() <= maxpx:
-                lo = mid + 1
-            else:
-                hi = mid
-        return s[:max(1,hi-1)] + "…"
-
     colw = []
     for i in range(len(COL_FRAC)-1):
         colw.append( max(10, int((COL_FRAC[i+1]-COL_FRAC[i]) * inner.w) - 10) )
     colw.append( max(10, inner.right - colx[-1] - 10) )
+    offs = tuple(cx-inner.x for cx in colx); colw = tuple(colw)
 
-    for i,ac in enumerate(rows):
+    table_page = max(1, (inner.bottom-row_y)//row_h)
+    table_top = max(0, min(table_top, len(rows)-table_page))
+    for i in range(table_top, min(len(rows), table_top+table_page)):
         if i%2: pygame.draw.rect(screen,C("ALTROW"),pygame.Rect(inner.x,row_y,inner.w,row_h))
-        fields = [
-            ("MIL" if ac.get('_mil') else "--"),
-            (ac.get('flight') or "--"),
-            (ac.get('hex') or "--").upper(),
-            (ac.get('alt_show') if ac.get('alt_show') else "--"),
-            (ac.get('spd_show') if ac.get('spd_show') else "--"),
-            (str(int((ac.get('track') if ac.get('track') is not None else ac.get('_bearing'))%360)) if (ac.get('track') is not None or ac.get('_bearing') is not None) else "--"),
-            (ac.get('squawk') or "--"),
-        ]
-        for c,txt in enumerate(fields):
-            color = WHITE if (c==1) else C("RINGS")
-            clipped = clip_txt(str(txt), colw[c], color)
-            screen.blit(ui_font.render(clipped,True,color),(colx[c],row_y+ROW_PAD_Y))
+        screen.blit(row_surface(rows[i], offs, colw, row_h),(inner.x,row_y))
         row_y+=row_h
-        if row_y>inner.bottom-row_h: break
+
+    if len(rows) > table_page:   # scrollbar on the right edge
+        top = uy+8; span = table_page*row_h
+        bar = pygame.Rect(inner.right-3, top + span*table_top//len(rows), 3, max(6, span*table_page//len(rows)))
+        pygame.draw.rect(screen,C("RINGS"),bar)
+    if len(_row_surfs) > 2*len(aircraft)+64:
+        live = aircraft.recs
+        for hx in [hx for hx in _row_surfs if hx not in live]: del _row_surfs[hx]
 
 def draw_delta(x,y,hdg,is_mil,scale=1.0):
     size = int(DELTA_SIZE_PX * scale)
@@ -405,109 +1259,868 @@ def parse_spd(it):
     if m is not None: return int(round(m*661.0))
     return None
 
-def preprocess(raw):
-    out=[]; now=time.time()
-    for it in raw:
+def preprocess(raw, now=None):
+    """Apply one poll to `aircraft` and the trails; returns the range-sorted snapshot.
+
+    `now` defaults to the wall clock; benchmarks and replays pass their own."""
+    rows=[]; now=time.time() if now is None else now
+    rbs=batch_range_brg([it.get("lat") for it in raw],[it.get("lon") for it in raw])
+    for it,(rnm,brg) in zip(raw,rbs):
         hx=(it.get("hex") or "").lower()
         lat,lon=it.get("lat"),it.get("lon")
-        rnm,brg=ll_to_range_brg(lat,lon)
         alt_v = parse_alt(it); spd_v = parse_spd(it)
         trk   = pnum(it.get("track")) or pnum(it.get("trak"))
-        ac={
-            "hex": hx,
-            "flight": (it.get("flight") or "").strip() or None,
-            "alt_show": (str(int(alt_v)) if alt_v is not None else None),
-            "spd_show": (str(int(spd_v)) if spd_v is not None else None),
-            "track": trk,
-            "lat": lat, "lon": lon,
-            "squawk": it.get("squawk"),
-            "_range_nm": rnm,
-            "_bearing": brg,
-            "_mil": mil_heuristic(hx)
-        }
-        out.append(ac)
-        if hx: last_seen[hx] = now
-        if trails_on and hx and lat is not None and lon is not None:
-            dq = trail_hist.setdefault(hx, collections.deque(maxlen=TRAIL_MAX_POINTS))
-            if dq:
-                lt, lla, llo = dq[-1]
+        if not hx: continue
+        rows.append((hx,
+            (it.get("flight") or "").strip() or None,        # flight
+            (str(int(alt_v)) if alt_v is not None else None), # alt_show
+            (str(int(spd_v)) if spd_v is not None else None), # spd_show
+            trk, lat, lon,
+            it.get("squawk"),
+            rnm, brg,
+            mil_heuristic(hx)))
+        trail_seen(hx, now)
+        if trails_on and lat is not None and lon is not None:
+            if hx in _db_lazy: trail_store_load(hx, now)
+            tr = trail_hist.get(hx)
+            if tr:
+                lt, lla, llo = tr.last()
                 dt = now - lt
                 dist_nm = gc_distance_nm(lla, llo, lat, lon) or 0.0
                 if (dt <= MAX_SAMPLE_GAP and MIN_MOVE_NM <= dist_nm < MAX_HOP_NM) or dt >= FORCE_SAMPLE_EVERY_SEC:
-                    dq.append((now, lat, lon))
+                    trail_append(hx, now, lat, lon, (rnm, brg))
             else:
-                dq.append((now, lat, lon))
-    cutoff=now-TRAIL_KEEP_SEC
-    for k in list(trail_hist.keys()):
-        if last_seen.get(k,0)<cutoff:
-            trail_hist.pop(k,None); last_seen.pop(k,None)
+                trail_append(hx, now, lat, lon, (rnm, brg))
+    trail_expire(now)
+    return aircraft.update(rows, now)
+
+# ---------------- Streaming Ingest ----------------
+# Instead of polling data.json, INGEST="sbs"/"beast" keeps a socket open to
+# dump1090's BaseStation (30003) or Beast (30005) output. Decoders apply each
+# message to a per-aircraft state dict shaped like a data.json entry, and the
+# states are pushed through preprocess() every STREAM_PUBLISH_SECS, so the
+# trails, table and renderer see exactly what the HTTP path gives them.
+class SBSDecoder:
+    """Incremental SBS-1 BaseStation CSV decoder (MSG lines only)."""
+
+    def __init__(self, states):
+        self.states = states; self.buf = b""
+
+    def reset(self): self.buf = b""
+
+    def drop(self, hx): pass
+
+    def feed(self, data, now):
+        *lines, self.buf = (self.buf + data).split(b"\n")
+        for ln in lines: self.line(ln.decode("ascii", "ignore").strip(), now)
+
+    def line(self, ln, now):
+        f = ln.split(",")
+        if len(f) < 11 or f[0] != "MSG": return
+        hx = f[4].strip().lower()
+        if not hx: return
+        st = self.states.setdefault(hx, {"hex": hx}); st["seen"] = now
+        def put(key, i, conv=float):
+            v = f[i].strip() if len(f) > i else ""
+            if not v: return
+            try: st[key] = conv(v)
+            except ValueError: pass
+        put("flight", 10, str); put("alt_baro", 11); put("gs", 12); put("track", 13)
+        if len(f) > 15 and f[14].strip() and f[15].strip():
+            put("lat", 14); put("lon", 15)
+        put("squawk", 17, str)
+        if len(f) > 21 and f[21].strip() == "-1": st["alt_baro"] = "ground"
+
+def _modes_crc(data):
+    """Mode S CRC-24 (generator 0x1FFF409) over `data`."""
+    crc = 0
+    for byte in data:
+        crc ^= byte << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000: crc ^= 0x1FFF409
+    return crc & 0xFFFFFF
+
+def _cpr_nl(lat):
+    """Number of CPR longitude zones at `lat`."""
+    if lat == 0: return 59
+    if abs(lat) == 87: return 2
+    if abs(lat) > 87: return 1
+    a = 1 - math.cos(math.pi/30); b = math.cos(math.radians(abs(lat)))**2
+    return int(math.floor(2*math.pi/math.acos(1 - a/b)))
+
+def cpr_global(even, odd, odd_latest):
+    """Airborne position from an even/odd CPR pair of (lat17/2^17, lon17/2^17); None if zones differ."""
+    (lat0, lon0), (lat1, lon1) = even, odd
+    j = math.floor(59*lat0 - 60*lat1 + 0.5)
+    rlat0 = 6.0*(j % 60 + lat0); rlat1 = (360/59)*(j % 59 + lat1)
+    if rlat0 >= 270: rlat0 -= 360
+    if rlat1 >= 270: rlat1 -= 360
+    nl = _cpr_nl(rlat0)
+    if nl != _cpr_nl(rlat1): return None
+    m = math.floor(lon0*(nl-1) - lon1*nl + 0.5)
+    if odd_latest:
+        ni = max(nl-1, 1); lat, lon = rlat1, (360/ni)*(m % ni + lon1)
+    else:
+        ni = max(nl, 1); lat, lon = rlat0, (360/ni)*(m % ni + lon0)
+    if lon >= 180: lon -= 360
+    return lat, lon
+
+def cpr_local(cpr, odd, ref_lat, ref_lon):
+    """Airborne position from one CPR frame near a reference position (within ~180 NM)."""
+    lat_c, lon_c = cpr
+    dlat = 360/(59 if odd else 60)
+    j = math.floor(ref_lat/dlat) + math.floor(0.5 + (ref_lat % dlat)/dlat - lat_c)
+    lat = dlat*(j + lat_c)
+    dlon = 360/max(_cpr_nl(lat) - odd, 1)
+    m = math.floor(ref_lon/dlon) + math.floor(0.5 + (ref_lon % dlon)/dlon - lon_c)
+    return lat, dlon*(m + lon_c)
+
+def _squawk(id13):
+    b = lambda i: (id13 >> (12-i)) & 1   # C1 A1 C2 A2 C4 A4 X B1 D1 B2 D2 B4 D4
+    a = b(5)*4 + b(3)*2 + b(1); bb = b(11)*4 + b(9)*2 + b(7)
+    c = b(4)*4 + b(2)*2 + b(0); d = b(12)*4 + b(10)*2 + b(8)
+    return f"{a}{bb}{c}{d}"
+
+_AIS = "#ABCDEFGHIJKLMNOPQRSTUVWXYZ##### ###############0123456789######"
+
+class BeastDecoder:
+    """Incremental Beast binary decoder.
+
+    Frames are <1a> <type> <6-byte clock> <signal> <message>, with 0x1a bytes
+    doubled inside. Decodes what the display uses: DF17/18 identification,
+    airborne position (CPR) and velocity, and the squawk from DF5/21."""
+    LEN = {0x31: 2, 0x32: 7, 0x33: 14}
+    CPR_PAIR_SECS = 10.0
+
+    def __init__(self, states):
+        self.states = states; self.buf = bytearray(); self.cpr = {}
+
+    def reset(self): self.buf = bytearray()
+
+    def feed(self, data, now):
+        buf = self.buf; buf += data; n = len(buf); i = 0
+        while True:
+            j = buf.find(0x1a, i)
+            if j < 0 or j+1 >= n: i = n if j < 0 else j; break
+            need = self.LEN.get(buf[j+1])
+            if need is None: i = j+1; continue        # escaped 0x1a or noise
+            need += 7; out = bytearray(); k = j+2; state = "ok"
+            while len(out) < need:
+                if k >= n: state = "short"; break
+                c = buf[k]
+                if c == 0x1a:
+                    if k+1 >= n: state = "short"; break
+                    if buf[k+1] != 0x1a: state = "bad"; break   # next frame started early
+                    k += 1
+                out.append(c); k += 1
+            if state == "short": i = j; break
+            i = k
+            if state == "ok" and need > 9: self.message(bytes(out[7:]), now)
+        del buf[:i]
+
+    def message(self, msg, now):
+        df = msg[0] >> 3
+        if df in (17, 18) and len(msg) == 14:
+            if _modes_crc(msg[:11]) != int.from_bytes(msg[11:], "big"): return
+            self.extended(msg[1:4].hex(), int.from_bytes(msg[4:11], "big"), now)
+        elif df in (5, 21):
+            hx = f"{_modes_crc(msg[:-3]) ^ int.from_bytes(msg[-3:], 'big'):06x}"
+            st = self.states.get(hx)   # parity-derived address: only trust known aircraft
+            if st is not None:
+                st["squawk"] = _squawk(int.from_bytes(msg[:4], "big") & 0x1FFF); st["seen"] = now
+
+    def extended(self, hx, me, now):
+        tc = me >> 51
+        st = self.states.setdefault(hx, {"hex": hx}); st["seen"] = now
+        if 1 <= tc <= 4:
+            st["flight"] = "".join(_AIS[(me >> (42-6*i)) & 0x3f] for i in range(8)).replace("#", "").strip()
+        elif 9 <= tc <= 18:
+            alt = (me >> 36) & 0xFFF
+            if alt & 0x10: st["alt_baro"] = (((alt >> 5) << 4) | (alt & 0xF))*25 - 1000
+            odd = (me >> 34) & 1
+            frame = (((me >> 17) & 0x1FFFF)/131072.0, (me & 0x1FFFF)/131072.0, now)
+            pair = self.cpr.setdefault(hx, [None, None]); pair[odd] = frame
+            other = pair[1-odd]
+            pos = None
+            if other is not None and now - other[2] <= self.CPR_PAIR_SECS:
+                e, o = (frame, other) if not odd else (other, frame)
+                pos = cpr_global(e[:2], o[:2], bool(odd))
+            elif st.get("lat") is not None:
+                pos = cpr_local(frame[:2], odd, st["lat"], st["lon"])
+            if pos: st["lat"], st["lon"] = pos
+        elif tc == 19 and ((me >> 48) & 7) in (1, 2):
+            v_ew = ((me >> 32) & 0x3FF) - 1; v_ns = ((me >> 21) & 0x3FF) - 1
+            if v_ew < 0 or v_ns < 0: return
+            if ((me >> 48) & 7) == 2: v_ew *= 4; v_ns *= 4
+            vx = -v_ew if (me >> 42) & 1 else v_ew
+            vy = -v_ns if (me >> 31) & 1 else v_ns
+            st["gs"] = math.hypot(vx, vy); st["track"] = (math.degrees(math.atan2(vx, vy)) + 360) % 360
+
+    def drop(self, hx): self.cpr.pop(hx, None)
+
+def stream_publish(dec, now):
+    """Expire quiet aircraft (and their decoder state) and push `dec`'s states through preprocess()."""
+    states = dec.states
+    for hx in [hx for hx, st in states.items() if now - st["seen"] > STREAM_STALE_SECS]:
+        del states[hx]; dec.drop(hx)
+    ingest(list(states.values()), now)
+
+def _stream_loop():
+    """Stream from dump1090's SBS/Beast port, reconnecting with exponential backoff."""
+    states = {}
+    dec = SBSDecoder(states) if INGEST == "sbs" else BeastDecoder(states)
+    port = SBS_PORT if INGEST == "sbs" else BEAST_PORT
+    backoff = STREAM_BACKOFF[0]; next_pub = 0.0
+    while not _stop_evt.is_set():
+        try:
+            with socket.create_connection((STREAM_HOST, port), timeout=5.0) as sock:
+                sock.settimeout(STREAM_PUBLISH_SECS)
+                backoff = STREAM_BACKOFF[0]; dec.reset()
+                while not _stop_evt.is_set():
+                    try:
+                        data = sock.recv(65536)
+                        if not data: break
+                        dec.feed(data, time.time())
+                    except socket.timeout:
+                        pass
+                    now = time.time()
+                    if now >= next_pub:
+                        next_pub = now + STREAM_PUBLISH_SECS
+                        try: stream_publish(dec, now)
+                        except Exception: pass
+                        metrics_tick()
+        except OSError:
+            pass
+        try: stream_publish(dec, time.time())
+        except Exception: pass
+        _stop_evt.wait(backoff); backoff = min(backoff*2, STREAM_BACKOFF[1])
+
+# ---------------- Record / Replay ----------------
+# RECORD_FILE logs every snapshot handed to preprocess() as it arrived.
+# The log is a run of zlib blocks of about RECORD_BLOCK_SEC each, with one
+# JSON snapshot per record:
+#
+#   block:  b"ADBK", t_first, t_last, n_records, compressed length, payload
+#   record: t, json length, json
+#
+# The block headers are the index. Opening a log seeks from header to
+# header, so finding a time hours in decompresses only the block that
+# holds it. REPLAY_FILE feeds the log back through ingest() at
+# REPLAY_SPEED, so replay drives the live code paths with the recorded
+# timestamps. data_clock() follows the replay, which keeps trail fading
+# and the clock in step with it.
+_BLK_FMT  = "<4sddII"
+_BLK_SIZE = struct.calcsize(_BLK_FMT)
+_REC_FMT  = "<dI"
+_REC_SIZE = struct.calcsize(_REC_FMT)
+_recorder = None
+_replay   = None
+
+def _scan_blocks(f):
+    """[(t_first, t_last, offset)] for every complete block, and the offset just past the last one."""
+    index = []; off = 0; f.seek(0, 2); end = f.tell(); f.seek(0)
+    while off + _BLK_SIZE <= end:
+        magic, t0, t1, n, clen = struct.unpack(_BLK_FMT, f.read(_BLK_SIZE))
+        if magic != b"ADBK" or off + _BLK_SIZE + clen > end: break
+        index.append((t0, t1, off)); off += _BLK_SIZE + clen; f.seek(off)
+    return index, off
+
+class RecordLog:
+    """Appends snapshots to a log, one compressed block per RECORD_BLOCK_SEC."""
+
+    def __init__(self, path):
+        self.f = open(path, "a+b")
+        _, good = _scan_blocks(self.f)
+        self.f.truncate(good); self.f.seek(good)   # drop a block cut short by a crash
+        self.recs = []; self.t0 = None; self.t1 = None
+
+    def add(self, t, raw):
+        body = fastjson.dumps(raw) if fastjson is not None else json.dumps(raw, separators=(",", ":")).encode()
+        if isinstance(body, str): body = body.encode()
+        self.recs.append(struct.pack(_REC_FMT, t, len(body)) + body)
+        if self.t0 is None: self.t0 = t
+        self.t1 = t
+        if t - self.t0 >= RECORD_BLOCK_SEC: self.flush()
+
+    def flush(self):
+        if not self.recs: return
+        payload = zlib.compress(b"".join(self.recs), 6)
+        self.f.write(struct.pack(_BLK_FMT, b"ADBK", self.t0, self.t1, len(self.recs), len(payload)) + payload)
+        self.f.flush()
+        self.recs = []; self.t0 = None
+
+    def close(self):
+        self.flush(); self.f.close()
+
+class ReplayLog:
+    """Reads a RecordLog back, seeking by block and pacing against the wall clock."""
+
+    def __init__(self, path, speed=1):
+        self.f = open(path, "rb")
+        self.index, _ = _scan_blocks(self.f)
+        self.speed = speed; self.t = self.index[0][0] if self.index else 0.0
+        self.wall = time.monotonic()
+
+    def span(self):
+        return (self.index[0][0], self.index[-1][1]) if self.index else (0.0, 0.0)
+
+    def block(self, i):
+        """Decode block `i` into [(t, raw)]."""
+        t0, t1, off = self.index[i]
+        self.f.seek(off)
+        _, _, _, n, clen = struct.unpack(_BLK_FMT, self.f.read(_BLK_SIZE))
+        data = zlib.decompress(self.f.read(clen)); out = []; p = 0
+        for _ in range(n):
+            t, ln = struct.unpack_from(_REC_FMT, data, p); p += _REC_SIZE
+            out.append((t, json_loads(data[p:p+ln]))); p += ln
+        return out
+
+    def records(self, start=None):
+        """Snapshots from `start` (log time) on, decoding only the blocks that are reached."""
+        start = self.span()[0] if start is None else start
+        i = bisect.bisect_left([b[1] for b in self.index], start)
+        for j in range(i, len(self.index)):
+            for t, raw in self.block(j):
+                if t >= start: yield t, raw
+
+    def clock(self):
+        """Log time now being played."""
+        return self.t + (time.monotonic() - self.wall)*self.speed
+
+    def seek(self, t):
+        self.t = t; self.wall = time.monotonic()
+
+    def set_speed(self, speed):
+        self.seek(self.clock()); self.speed = speed
+
+def data_clock():
+    """Wall time live, the log's time during a replay."""
+    return time.time() if _replay is None else _replay.clock()
+
+def ingest(raw, now=None):
+    """Hand one snapshot to preprocess(), logging it first when recording."""
+    now = time.time() if now is None else now
+    if _recorder is not None: _recorder.add(now, raw)
+    acs = preprocess(raw, now)
+    if _in_worker: shm_publish(_shm, acs)
+    return acs
+
+def replay_speed(step):
+    if _replay is None: return
+    i = REPLAY_SPEEDS.index(min(REPLAY_SPEEDS, key=lambda v: abs(v - _replay.speed)))
+    _replay.set_speed(REPLAY_SPEEDS[max(0, min(len(REPLAY_SPEEDS)-1, i + step))])
+
+def _replay_loop():
+    """Play REPLAY_FILE through preprocess() at the replay clock's pace."""
+    t0, _ = _replay.span()
+    start = REPLAY_START if REPLAY_START > 1e9 else t0 + REPLAY_START
+    _replay.seek(start)
+    for t, raw in _replay.records(start):
+        while not _stop_evt.is_set():
+            wait = (t - _replay.clock())/_replay.speed
+            if wait <= 0: break
+            _stop_evt.wait(min(wait, 0.25))
+        if _stop_evt.is_set(): return
+        preprocess(raw, t)
+        metrics_tick()
+
+def ingest_loop():
+    """The ingest side for the configured source: replay, HTTP polling or a TCP stream."""
+    global _recorder, _replay
+    if REPLAY_FILE:
+        _replay = ReplayLog(REPLAY_FILE, REPLAY_SPEED)
+        return _replay_loop()
+    if RECORD_FILE: _recorder = RecordLog(RECORD_FILE)
+    trail_store_open()
+    try:
+        (_poll_loop if INGEST == "http" else _stream_loop)()
+    finally:
+        if _recorder is not None: _recorder.close()
+        trail_store_close()
+
+# ---------------- Worker Process ----------------
+# With WORKER_PROCESS on, a forked child runs the whole ingest side (fetch or
+# stream, parse, preprocess, trail bookkeeping) and publishes each result into
+# a double-buffered shared-memory block. The render loop mirrors the newest
+# buffer into `aircraft` and `trail_hist` with shm_pull(), copying only the
+# trail samples it has not seen. Each buffer carries a seqlock counter (odd
+# while being written) so a read that races a write is simply retried.
+#
+# Records go out in the worker's range order with their generation and
+# dead-reckoning state, so the parent rebuilds only records whose gen moved
+# and never sorts or reruns dr_update(). Trail rows carry their lod masks and
+# are copied into the mirror's rings as they are.
+#
+#   header: magic, gen, active buffer, seq[0], seq[1], metrics on
+#   stats:  seq, length, JSON of the worker's timers and feed stats
+#   buffer: n_aircraft, n_samples, table gen, aircraft records, trail samples (Trail rows)
+#
+# Trail samples are shared out evenly: each track publishes at most
+# SHM_MAX_SAMPLES/n of its newest samples. The mirror appends what is new
+# when that tail covers it, and otherwise reloads the trail from the tail.
+#
+# The parent owns METRICS_FILE and the F3 HUD. It sets the "metrics on"
+# flag, and while that is set the worker writes its timers to the stats
+# block about once a second. metrics_summary() merges them with the
+# parent's render timers.
+_AC_FMT   = "<8s8s4siidddddBqdddddddqqq"  # hex flight squawk alt spd track lat lon range brg mil gen | fix_t x y vx vy ex ey | trail off/count/seq
+_AC_SIZE  = struct.calcsize(_AC_FMT)
+_NO_INT   = -2**31
+_SHM_HDR  = 64
+_SHM_STATS = 65536
+_SHM_BASE = _SHM_HDR + _SHM_STATS
+_SHM_SAMP = 24 + SHM_MAX_AIRCRAFT*_AC_SIZE
+_SHM_SAMP += -_SHM_SAMP % 8
+_SHM_BUF  = _SHM_SAMP + SHM_MAX_SAMPLES*Trail.W*8
+_shm      = None
+_shm_gen  = 0
+_in_worker = False
+_worker_stats = (None, {})   # (stats seq, decoded stats) last read by the parent
+
+def _nan(v): return math.nan if v is None else float(v)
+def _none(v): return None if v != v else v
+
+def shm_publish(shm, acs):
+    """Write `acs` and their trails into the inactive buffer, then flip to it."""
+    buf = shm.buf; W = Trail.W
+    b = 1 - struct.unpack_from("<Q", buf, 16)[0]
+    base = _SHM_BASE + b*_SHM_BUF; seq_off = 24 + 8*b
+    seq = struct.unpack_from("<Q", buf, seq_off)[0]
+    struct.pack_into("<Q", buf, seq_off, seq+1)
+    samples = buf[base+_SHM_SAMP:base+_SHM_BUF].cast("d")
+    acs = acs[:SHM_MAX_AIRCRAFT]
+    share = SHM_MAX_SAMPLES//max(1, len(acs))   # per-track tail, so every trail keeps updating
+    used = n = 0
+    for ac in acs:
+        tr = trail_hist.get(ac.hex); off = used; cnt = tseq = 0
+        if tr:
+            cnt = min(len(tr), share); tseq = tr.seq
+            if cnt: samples[used*W:(used+cnt)*W] = tr.rows(cnt); used += cnt
+        struct.pack_into(_AC_FMT, buf, base+24+n*_AC_SIZE,
+            ac.hex.encode()[:8], (ac.flight or "").encode()[:8], str(ac.squawk or "").encode()[:4],
+            int(ac.alt_show) if ac.alt_show else _NO_INT, int(ac.spd_show) if ac.spd_show else _NO_INT,
+            _nan(ac.track), _nan(ac.lat), _nan(ac.lon), _nan(ac.range_nm), _nan(ac.bearing),
+            ac.mil, ac.gen, _nan(ac.fix_t), _nan(ac.x), _nan(ac.y), ac.vx, ac.vy, ac.ex, ac.ey, off, cnt, tseq)
+        n += 1
+    samples.release()
+    struct.pack_into("<QQQ", buf, base, n, used, aircraft.gen)
+    struct.pack_into("<Q", buf, seq_off, seq+2)
+    struct.pack_into("<Q", buf, 16, b)
+    struct.pack_into("<Q", buf, 8, struct.unpack_from("<Q", buf, 8)[0] + 1)
+
+def shm_pull():
+    """Mirror the worker's newest publish into `aircraft`/`trail_hist`; True when there was one."""
+    global _shm_gen
+    buf = _shm.buf; W = Trail.W
+    gen = struct.unpack_from("<Q", buf, 8)[0]
+    if gen == _shm_gen: return False
+    for _ in range(8):
+        b = struct.unpack_from("<Q", buf, 16)[0]
+        base = _SHM_BASE + b*_SHM_BUF; seq_off = 24 + 8*b
+        seq = struct.unpack_from("<Q", buf, seq_off)[0]
+        if seq & 1: time.sleep(0.001); continue
+        n, _, table_gen = struct.unpack_from("<QQQ", buf, base)
+        recs = list(struct.iter_unpack(_AC_FMT, buf[base+24:base+24+n*_AC_SIZE]))
+        hexes = [r[0].rstrip(b"\0").decode() for r in recs]
+        copies = {}; stale = []
+        for hx, r in zip(hexes, recs):
+            off, cnt, tseq = r[-3:]
+            tr = trail_hist.get(hx)
+            if tr is not None and tr.seq == tseq: continue
+            if not cnt:   # no trail on the worker, or no room to send it: don't keep a stale copy
+                if tr is not None: stale.append(hx)
+                continue
+            k = tseq - tr.seq if tr is not None and 0 < tseq - tr.seq <= cnt else None
+            lo = off + cnt - (cnt if k is None else k)
+            a = array('d'); a.frombytes(buf[base+_SHM_SAMP+lo*W*8:base+_SHM_SAMP+(off+cnt)*W*8])
+            copies[hx] = (k, tseq, a)
+        if struct.unpack_from("<Q", buf, seq_off)[0] == seq: break
+    else:
+        return False
+    order = []; have = aircraft.recs
+    for hx, r in zip(hexes, recs):
+        rec = have.get(hx)
+        if rec is None or rec.gen != r[11]:
+            _, fl, sq, alt, spd, trk, lat, lon, rnm, brg, mil, g, ft, x, y, vx, vy, ex, ey = r[:19]
+            row = (hx, fl.rstrip(b"\0").decode() or None,
+                   str(alt) if alt != _NO_INT else None, str(spd) if spd != _NO_INT else None,
+                   trk if trk == trk else None, lat if lat == lat else None, lon if lon == lon else None,
+                   sq.rstrip(b"\0").decode() or None,
+                   rnm if rnm == rnm else None, brg if brg == brg else None, bool(mil))
+            rec = Aircraft(hx)
+            (rec.flight, rec.alt_show, rec.spd_show, rec.track, rec.lat, rec.lon,
+             rec.squawk, rec.range_nm, rec.bearing, rec.mil) = row[1:]
+            rec._row = row; rec.gen = g
+            rec.fix_t, rec.x, rec.y = ft if ft == ft else None, x if x == x else None, y if y == y else None
+            rec.vx, rec.vy, rec.ex, rec.ey = vx, vy, ex, ey
+        order.append(rec)
+    for hx in stale: trail_drop(hx)
+    for hx, (k, tseq, a) in copies.items():
+        tr = trail_hist.get(hx)
+        if k is None:   # first sight, or too far behind for the published tail: reload it
+            if tr is None: tr = trail_hist[hx] = Trail()
+            else: invalidate_trails(); trail_mem["bytes"] -= tr.nbytes()
+            tr.load(a, tseq); _trail_px.pop(hx, None)
+            trail_mem["bytes"] += tr.nbytes()
+        else:
+            trail_mem["bytes"] += tr.extend(a, tseq)
+    live = {a.hex for a in order}
+    for hx in [hx for hx in trail_hist if hx not in live]: trail_drop(hx)
+    aircraft.install(order, table_gen)
+    _shm_gen = gen
+    return True
+
+def shm_put_stats(shm, stats):
+    """Write the worker's stats block (seqlocked like the buffers)."""
+    body = json.dumps(stats).encode()[:_SHM_STATS-16]
+    seq = struct.unpack_from("<Q", shm.buf, _SHM_HDR)[0]
+    struct.pack_into("<QQ", shm.buf, _SHM_HDR, seq+1, len(body))
+    shm.buf[_SHM_HDR+16:_SHM_HDR+16+len(body)] = body
+    struct.pack_into("<Q", shm.buf, _SHM_HDR, seq+2)
+
+def worker_stats():
+    """The worker's latest {"timers", "feeds", "trail_db"}, decoded once per write."""
+    global _worker_stats
+    if _shm is None or _in_worker: return {}
+    for _ in range(8):
+        seq, n = struct.unpack_from("<QQ", _shm.buf, _SHM_HDR)
+        if seq == _worker_stats[0] or not seq: return _worker_stats[1]
+        if seq & 1: continue
+        body = bytes(_shm.buf[_SHM_HDR+16:_SHM_HDR+16+n])
+        if struct.unpack_from("<Q", _shm.buf, _SHM_HDR)[0] == seq:
+            try: _worker_stats = (seq, json.loads(body))
+            except ValueError: pass
+            break
+    return _worker_stats[1]
+
+def _worker_main(stop):
+    """Child process: ingest as usual; ingest() publishes every preprocess() result to shared memory."""
+    global _stop_evt, _in_worker
+    _stop_evt = stop; _in_worker = True
+    ingest_loop()
+
+def start_worker():
+    """Start the ingest process; returns (process, stop event) or None to use the poll thread."""
+    global _shm
+    try:
+        ctx = multiprocessing.get_context("fork")
+        _shm = shared_memory.SharedMemory(create=True, size=_SHM_BASE + 2*_SHM_BUF)
+    except (ValueError, OSError):
+        return None
+    _shm.buf[:_SHM_BASE] = bytes(_SHM_BASE); _shm.buf[:4] = b"ADSB"
+    struct.pack_into("<Q", _shm.buf, 40, metrics_on)
+    stop = ctx.Event()
+    proc = ctx.Process(target=_worker_main, args=(stop,), name="adsb-ingest", daemon=True)
+    proc.start()
+    return proc, stop
+
+def stop_worker(worker):
+    proc, stop = worker
+    stop.set(); proc.join(timeout=2.0)
+    if proc.is_alive(): proc.terminate()
+    _shm.close(); _shm.unlink()
+
+# ---------------- Dead Reckoning ----------------
+# Between fixes each delta is moved along its track at its ground speed.
+# The work is split by rate. At each new fix, dr_update() stores the
+# position and velocity on the flat range/bearing plane the trails use
+# (nm, x east, y north), plus the offset from where the delta was being
+# drawn. Each frame, dead_reckon() evaluates position + velocity*age +
+# offset*(1 - age/DR_BLEND_SEC), over numpy arrays built once per table
+# generation. Extrapolation stops DR_MAX_AGE_SEC after the last fix.
+_dr_key = None
+_dr_arr = None
+
+def _dr_at(rec, now):
+    age = now - rec.fix_t
+    dt = min(max(age, 0.0), DR_MAX_AGE_SEC); k = max(0.0, 1.0 - age/DR_BLEND_SEC)
+    return rec.x + rec.vx*dt + rec.ex*k, rec.y + rec.vy*dt + rec.ey*k
+
+def dr_update(rec, now, moved):
+    """Refresh `rec`'s velocity; on a new fix also its position, fix time and blend offset."""
+    if moved:
+        prev = _dr_at(rec, now) if rec.x is not None else None
+        if rec.range_nm is None or rec.bearing is None:
+            rec.x = rec.y = None
+        else:
+            a = math.radians(rec.bearing)
+            rec.x, rec.y = rec.range_nm*math.sin(a), rec.range_nm*math.cos(a)
+        rec.ex = rec.ey = 0.0; rec.fix_t = now
+        if prev is not None and rec.x is not None:
+            ex, ey = prev[0]-rec.x, prev[1]-rec.y
+            if math.hypot(ex, ey) < DR_SNAP_NM: rec.ex, rec.ey = ex, ey
+    spd = pnum(rec.spd_show)
+    if spd and rec.track is not None:
+        a = math.radians(rec.track); v = spd/3600.0
+        rec.vx, rec.vy = v*math.sin(a), v*math.cos(a)
+    else:
+        rec.vx = rec.vy = 0.0
+
+def _dr_arrays(acs):
+    """Per-aircraft x, y, vx, vy, ex, ey, fix_t as numpy columns, rebuilt once per generation."""
+    global _dr_key, _dr_arr
+    key = (aircraft.gen, mil_only, len(acs))
+    if key != _dr_key:
+        _dr_arr = np.array([(math.nan if a.x is None else a.x, math.nan if a.y is None else a.y,
+                             a.vx, a.vy, a.ex, a.ey, a.fix_t or 0.0) for a in acs], dtype=float).reshape(-1, 7).T
+        _dr_key = key
+    return _dr_arr
+
+def dead_reckon(acs, now):
+    """[(range_nm, bearing)] for `acs` extrapolated to `now`; (None, None) where unknown."""
+    if np is None or len(acs) < BATCH_MIN:
+        out = []
+        for a in acs:
+            if a.x is None: out.append((None, None)); continue
+            x, y = _dr_at(a, now)
+            out.append((math.hypot(x, y), math.degrees(math.atan2(x, y)) % 360.0))
+        return out
+    x, y, vx, vy, ex, ey, t = _dr_arrays(acs)
+    age = now - t
+    dt = np.clip(age, 0.0, DR_MAX_AGE_SEC); k = np.clip(1.0 - age/DR_BLEND_SEC, 0.0, 1.0)
+    px = x + vx*dt + ex*k; py = y + vy*dt + ey*k
+    return list(zip(np.hypot(px, py).tolist(), (np.degrees(np.arctan2(px, py)) % 360.0).tolist()))
+
+def dr_moving(now):
+    """True while some delta is still being extrapolated or blended, i.e. the radar must redraw."""
+    if not DEAD_RECKON: return False
+    return any(a.fix_t is not None and now - a.fix_t < max(DR_MAX_AGE_SEC if (a.vx or a.vy) else 0.0,
+                                                           DR_BLEND_SEC if (a.ex or a.ey) else 0.0)
+               for a in aircraft.snapshot(mil_only))
+
+# ---------------- Label Placement ----------------
+# With DECLUTTER on, tags are placed in priority order (MIL first, then
+# nearest) into a uniform grid of DECLUTTER_MIN_DIST cells. Each tag tries a
+# few offsets around its delta and is dropped when all of them collide with a
+# delta or a tag already placed. Placements are kept until the next poll or
+# view change and stored relative to the delta.
+LABEL_OFFSETS = ((23,-12), (23,4), (-23,-12), (-23,4))  # dx<0: tag ends left of the delta
+_labels_key = None
+_labels     = {}
+
+def place_labels(items):
+    """items: [(hex, x, y, text)] in priority order; returns {hex: (dx, dy)} for tags that fit."""
+    cell = DECLUTTER_MIN_DIST; grid = {}; out = {}
+    def cells(r):
+        return [(i,j) for i in range(r.left//cell, r.right//cell+1)
+                      for j in range(r.top//cell, r.bottom//cell+1)]
+    for _, x, y, _ in items:
+        r = pygame.Rect(x-DELTA_SIZE_PX, y-DELTA_SIZE_PX, 2*DELTA_SIZE_PX, 2*DELTA_SIZE_PX)
+        for c in cells(r): grid.setdefault(c, []).append(r)
+    th = tag_font.get_height()
+    for hx, x, y, txt in items:
+        tw = text_width(tag_font, txt)
+        for dx, dy in LABEL_OFFSETS:
+            r = pygame.Rect(x+dx if dx > 0 else x+dx-tw, y+dy, tw, th)
+            cs = cells(r)
+            if any(r.colliderect(o) for c in cs for o in grid.get(c, ())): continue
+            for c in cs: grid.setdefault(c, []).append(r)
+            out[hx] = (r.x-x, r.y-y)
+            break
     return out
 
-def draw_scene():
-    w,h=screen.get_size()
-    screen.fill(C("BG")); layout(w,h)
-    pygame.draw.rect(screen,C("NEON"),radar_rect,OUTLINE_W,border_radius=8)
-    pygame.draw.rect(screen,C("NEON"),right_rect,OUTLINE_W,border_radius=8)
-    draw_top(); draw_rings(); draw_badges()
+def labels_for(items):
+    global _labels_key, _labels
+    key = (aircraft.gen, _range_idx, center, radius_px, mil_only)
+    if key != _labels_key:
+        items = sorted(items, key=lambda it: not mil_heuristic(it[0]))
+        _labels = place_labels(items); _labels_key = key
+    return _labels
 
+def draw_radar():
     cx,cy=center
-    trail_layer=pygame.Surface((w,h),pygame.SRCALPHA)
     rng = current_range_nm()
-    #acs=[a for a in aircraft if (not mil_only or a.get('_mil'))]
-    #acs.sort(key=lambda a:(a.get('_range_nm')is None,a.get('_range_nm')or 0.0))
-        # take a snapshot of aircraft under a lock
-    with _air_lock:
-        acs = list(aircraft)
-    acs = [a for a in acs if (not mil_only or a.get('_mil'))]
-    acs.sort(key=lambda a:(a.get('_range_nm') is None, a.get('_range_nm') or 0.0))
-
-
-    for ac in acs:
-        rnm=ac.get('_range_nm'); brg_pos=ac.get('_bearing')
-        if rnm is None or rnm>rng or brg_pos is None: continue
-        rr=int(nm_to_px(rnm,rng,radius_px)); x,y=bearing_to_xy(cx,cy,rr,brg_pos)
-        hdg = ac.get('track') if ac.get('track') is not None else brg_pos
-        draw_delta(x,y,hdg,ac.get('_mil',False),scale=1.0)
+    acs = aircraft.snapshot(mil_only)
+    rbs = dead_reckon(acs, data_clock()) if DEAD_RECKON else [(a.range_nm,a.bearing) for a in acs]
+    pos=batch_rb_to_px(rbs,rng,cx,cy)
+    tags=[]
+    for ac,p in zip(acs,pos):
+        if p is None: continue
+        x,y=p; brg_pos=ac.bearing
+        hdg = ac.track if ac.track is not None else brg_pos
+        draw_delta(x,y,hdg,ac.mil,scale=1.0)
+        cs=ac.flight or ac.hex.upper()
         if not declutter:
-            cs=ac.get('flight') or ac.get('hex','').upper()
-            screen.blit(tag_font.render(cs,True,WHITE),(x+23,y-12))  # DELTA ICAO SPACING +X (X-AXIS), Y- (Y-AXIS) 
-        if trails_on:
-            hx=ac.get('hex')
-            if hx and hx in trail_hist:
-                dq=trail_hist[hx]
-                pts=[]
-                for (tt,lt,ln) in dq:
-                    rnm_h,brg_h=ll_to_range_brg(lt,ln)
-                    if rnm_h is None or brg_h is None or rnm_h>rng:
-                        pts.append(None);continue
-                    rr_h=int(nm_to_px(rnm_h,rng,radius_px))
-                    pts.append(bearing_to_xy(cx,cy,rr_h,brg_h))
-                lastp=None; n=len(pts); r,g,b=C("TRAIL")
-                for i,p in enumerate(pts):
-                    if p is None: lastp=None;continue
-                    if lastp:
-                        dpx=math.hypot(p[0]-lastp[0],p[1]-lastp[1])
-                        if dpx<=MAX_SEG_PX:
-                            t=(i/max(1,n-1));a=60+int(180*(t*t))
-                            pygame.draw.line(trail_layer,(r,g,b,a),lastp,p,TRAIL_WIDTH)
-                        else:lastp=None;continue
-                    lastp=p
-    screen.blit(trail_layer,(0,0))
-    draw_right(); draw_bottom()
+            screen.blit(render_text(tag_font,cs,WHITE),(x+23,y-12))  # DELTA ICAO SPACING +X (X-AXIS), Y- (Y-AXIS) 
+        else: tags.append((ac.hex,x,y,cs))
+    if tags:
+        placed=labels_for(tags)
+        for hx,x,y,cs in tags:
+            if hx in placed:
+                dx,dy=placed[hx]; screen.blit(render_text(tag_font,cs,WHITE),(x+dx,y+dy))
+    if trails_on: draw_trails([ac.hex for ac in acs if ac.hex in trail_hist])
+
+REGIONS = ("top","radar","table","bottom")
+
+def draw_scene(dirty=None):
+    """Redraw the `dirty` regions (all of them when None); returns the rects to push."""
+    w,h=screen.get_size()
+    layout(w,h)
+    rects={"top":topbar_rect,"radar":radar_rect,"table":right_rect,"bottom":bottbar_rect}
+    full = dirty is None
+    if full: dirty = REGIONS
+    draw_background(None if full else [rects[r] for r in dirty])
+    for r in REGIONS:
+        if r not in dirty: continue
+        screen.set_clip(rects[r])
+        if r=="top": draw_top()
+        elif r=="radar": draw_radar()
+        elif r=="table": draw_right()
+        else: draw_bottom()
+    screen.set_clip(None)
+    if hud_on and "radar" in dirty: draw_hud()
+    return [screen.get_rect()] if full else [rects[r] for r in dirty]
+
+def present(rects=None):
+    if rects is None: pygame.display.flip()
+    else: pygame.display.update(rects)
+
+# ---------------- Instrumentation ----------------
+# Hot-path functions are swapped for timing wrappers only while metrics are
+# on, so disabled timers cost nothing. Each keeps a rolling window of
+# durations for percentiles; the poll thread writes them to METRICS_FILE.
+TIMED = ("poll_once","fetch_adsb","stream_publish","preprocess","shm_publish","shm_pull",
+         "draw_scene","draw_rings","draw_trails","draw_right","present")
+_timers      = {n: collections.deque(maxlen=METRICS_WINDOW) for n in TIMED}
+_timer_count = dict.fromkeys(TIMED, 0)
+_timed_orig  = {}
+metrics_on   = False
+hud_on       = False
+_hud_cache   = (None, [])
+_next_export = 0.0
+
+def _timed(name, f):
+    q = _timers[name]
+    def timed(*a, **k):
+        t0 = time.perf_counter()
+        try: return f(*a, **k)
+        finally:
+            q.append(time.perf_counter()-t0); _timer_count[name] += 1
+    return timed
+
+def set_metrics(on):
+    global metrics_on
+    if _shm is not None and not _in_worker: struct.pack_into("<Q", _shm.buf, 40, bool(on))
+    g = globals()
+    for name in TIMED:
+        if on and name not in _timed_orig:
+            _timed_orig[name] = g[name]; g[name] = _timed(name, g[name])
+        elif not on and name in _timed_orig:
+            g[name] = _timed_orig.pop(name)
+    metrics_on = on
+
+def metrics_summary():
+    """{timer: {"count", "p50", "p95", "p99", "max"}} in seconds over the rolling window.
+
+    With a worker process, its ingest timers are included."""
+    out = dict(worker_stats().get("timers", {}))
+    for name in TIMED:
+        s = sorted(_timers[name]); n = len(s)
+        if not n: continue
+        out[name] = {"count": _timer_count[name], "p50": s[n//2], "p95": s[min(n-1, int(n*0.95))],
+                     "p99": s[min(n-1, int(n*0.99))], "max": s[-1]}
+    return out
+
+def export_metrics(path):
+    """Write metrics as JSON (.json) or Prometheus text (anything else), atomically."""
+    summ = metrics_summary()
+    gauges = {"tracks": len(aircraft), "trail_bytes": trail_mem["bytes"], "trail_tracks": len(trail_hist),
+              "text_cache_hits": text_stats["hits"], "text_cache_misses": text_stats["misses"],
+              "proj_cache_hits": proj_stats["hits"], "proj_cache_misses": proj_stats["misses"]}
+    if _db_path: gauges.update({"trail_db_" + k: v for k, v in db_stats.items()})
+    gauges.update({f"startup_{k}_ms": round(v, 1) for k, v in startup.items()})
+    feeds = feed_snapshot()
+    child = worker_stats()
+    if child.get("feeds"): feeds = child["feeds"]
+    gauges.update({"trail_db_" + k: v for k, v in child.get("trail_db", {}).items()})
+    if path.endswith(".json"):
+        body = json.dumps({"time": time.time(), "timers": summ, "gauges": gauges, "feeds": feeds})
+    else:
+        lines = ["# TYPE adsb_stage_seconds summary"]
+        for name, st in summ.items():
+            for q, qs in (("p50","0.5"),("p95","0.95"),("p99","0.99")):
+                lines.append(f'adsb_stage_seconds{{stage="{name}",quantile="{qs}"}} {st[q]:.6f}')
+            lines.append(f'adsb_stage_seconds_count{{stage="{name}"}} {st["count"]}')
+        for k, v in gauges.items():
+            lines += [f"# TYPE adsb_{k} gauge", f"adsb_{k} {v}"]
+        for k in ("latency_ms", "msg_rate", "aircraft", "ok", "errors", "timeouts"):
+            vals = [(u, st[k]) for u, st in feeds.items() if st[k] is not None]
+            if vals: lines.append(f"# TYPE adsb_feed_{k} gauge")
+            lines += [f'adsb_feed_{k}{{feed="{u}"}} {v}' for u, v in vals]
+        body = "\n".join(lines) + "\n"
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f: f.write(body)
+    os.replace(tmp, path)
+
+def feed_snapshot():
+    return {u: {k: v for k, v in st.items() if not k.startswith("_")} for u, st in list(feed_stats.items())}
+
+def metrics_tick():
+    """Writes METRICS_FILE every METRICS_EVERY seconds.
+
+    Called by the ingest thread, and by the render loop when a worker process
+    does the ingest. In the worker it instead follows the parent's metrics
+    flag and passes its timers up through shared memory."""
+    global _next_export
+    if _in_worker:
+        on = bool(struct.unpack_from("<Q", _shm.buf, 40)[0])
+        if on != metrics_on: set_metrics(on)
+        if on and time.time() >= _next_export:
+            _next_export = time.time() + 1.0
+            shm_put_stats(_shm, {"timers": metrics_summary(), "feeds": feed_snapshot(),
+                                 "trail_db": db_stats if _db_path else {}})
+        return
+    if METRICS_FILE and time.time() >= _next_export:
+        _next_export = time.time() + METRICS_EVERY
+        try: export_metrics(METRICS_FILE)
+        except Exception: pass
+
+def toggle_hud():
+    global hud_on
+    hud_on = not hud_on
+    set_metrics(hud_on or METRICS_ON or bool(METRICS_FILE))
+
+def draw_hud():
+    """Timer percentiles (ms) in the radar's top-right corner, refreshed once a second."""
+    global _hud_cache
+    sec = int(time.time())
+    if _hud_cache[0] != sec:
+        lines = [f"{'STAGE':<12}{'P50':>7}{'P95':>7}{'MAX':>7}"]
+        for name, st in metrics_summary().items():
+            lines.append(f"{name.upper():<12}{st['p50']*1e3:7.2f}{st['p95']*1e3:7.2f}{st['max']*1e3:7.2f}")
+        _hud_cache = (sec, lines)
+    lines = _hud_cache[1]
+    lh = tag_font.get_height()
+    w = max(text_width(tag_font, l) for l in lines) + 16; h = lh*len(lines) + 12
+    box = pygame.Rect(radar_rect.right-w-10, radar_rect.y+10, w, h)
+    pygame.draw.rect(screen, C("BG"), box)
+    pygame.draw.rect(screen, C("RINGS"), box, 1, border_radius=6)
+    for i, l in enumerate(lines):
+        screen.blit(render_text(tag_font, l, C("MINT") if i == 0 else WHITE), (box.x+8, box.y+6+i*lh))
 
 # ---------------- Controls ----------------
 def handle_key(k):
     global trails_on,declutter,mil_only,pal_ix,_range_idx
     if k in(pygame.K_EQUALS,pygame.K_PLUS,pygame.K_KP_PLUS):
-        if _range_idx<len(ALLOWED_RANGES)-1:_range_idx+=1
+        if _range_idx<len(ALLOWED_RANGES)-1:_range_idx+=1;invalidate_projection()
     elif k in(pygame.K_MINUS,pygame.K_UNDERSCORE,pygame.K_KP_MINUS):
-        if _range_idx>0:_range_idx-=1
-    elif k==pygame.K_t:trails_on=not trails_on
+        if _range_idx>0:_range_idx-=1;invalidate_projection()
+    elif k==pygame.K_t:trails_on=not trails_on;invalidate_trails()
     elif k==pygame.K_d:declutter=not declutter
     elif k==pygame.K_m:mil_only=not mil_only
     elif k==pygame.K_n:
         pal_ix=(pal_ix+1)%len(PALETTES)
         pygame.display.set_caption(f"Lightning — {PALETTES[pal_ix]['name']}")
+    elif k==pygame.K_F3:toggle_hud()
+    elif k==pygame.K_PAGEDOWN:table_scroll(table_page)
+    elif k==pygame.K_PAGEUP:table_scroll(-table_page)
+    elif k==pygame.K_DOWN:table_scroll(1)
+    elif k==pygame.K_UP:table_scroll(-1)
+    elif k==pygame.K_HOME:table_scroll(to=0)
+    elif k==pygame.K_END:table_scroll(to=-1)
+    elif k==pygame.K_LEFTBRACKET:replay_speed(-1)
+    elif k==pygame.K_RIGHTBRACKET:replay_speed(1)
     elif k==pygame.K_F11:toggle_fullscreen()
     elif k==pygame.K_ESCAPE:pygame.event.post(pygame.event.Event(pygame.QUIT))
 
@@ -521,32 +2134,265 @@ def toggle_fullscreen():
         info=pygame.display.Info()
         screen=pygame.display.set_mode((info.current_w,info.current_h),
                                        pygame.FULLSCREEN|pygame.SCALED)
+    invalidate_projection(); invalidate_background()
+
+# ---------------- Serve Mode ----------------
+# With SERVE_PORT set, serve_main() runs the ingest pipeline headless and
+# shares its result over HTTP, so one box can feed a wall of displays:
+#
+#   /data.json                  dump1090-style snapshot (ETag per table generation);
+#                               another station can use it as its DUMP_URL
+#   /delta.json?since=G&wait=S  aircraft changed/removed since generation G, keyed by
+#                               hex; waits up to S seconds for a new one (long poll)
+#   /trails.json?since=T        trail samples newer than T for the aircraft on the table
+#   /frame.png, /frames.mjpg    the rendered radar (SERVE_FRAMES only)
+#
+# A station fetching /data.json sees the "trails" link and seeds its trails
+# from it once, so it starts with the server's history.
+_seeded = set()       # serve-mode URLs whose trails were already seeded
+_served = (None, b"") # (gen, /data.json body)
+_frames = {}          # "png"/"jpg" -> (time, bytes)
+_frame_cond = threading.Condition()
+_frame_want = {"png": 0.0, "jpg": 0.0}
+
+def ac_json(ac, now):
+    """`ac` in dump1090's aircraft.json vocabulary."""
+    d = {"hex": ac.hex}
+    if ac.flight: d["flight"] = ac.flight
+    if ac.alt_show: d["alt_baro"] = int(ac.alt_show)
+    if ac.spd_show: d["gs"] = int(ac.spd_show)
+    if ac.track is not None: d["track"] = ac.track
+    if ac.lat is not None and ac.lon is not None: d["lat"], d["lon"] = ac.lat, ac.lon
+    if ac.squawk: d["squawk"] = ac.squawk
+    if ac.fix_t is not None: d["seen_pos"] = round(max(0.0, now - ac.fix_t), 1)
+    return d
+
+def _dumps(obj):
+    body = fastjson.dumps(obj) if fastjson is not None else json.dumps(obj, separators=(",", ":"))
+    return body.encode() if isinstance(body, str) else body
+
+def served_snapshot():
+    """(gen, /data.json body), rebuilt once per table generation."""
+    global _served
+    gen = aircraft.gen
+    if _served[0] != gen:
+        now = data_clock()
+        with _air_lock: acs = [ac_json(a, now) for a in aircraft.order]
+        _served = (gen, _dumps({"now": now, "messages": 0, "trails": "/trails.json", "aircraft": acs}))
+    return _served
+
+def aircraft_delta(since, wait=0.0):
+    """Changes since generation `since` keyed by hex; a full list when it is too old to diff.
+
+    Waits up to `wait` seconds for a newer generation, except when `since` is
+    0 or ahead of the table (a client from before a restart): those get the
+    full list at once."""
+    if wait > 0 and 0 < since <= aircraft.gen:
+        with _air_cond: _air_cond.wait_for(lambda: aircraft.gen > since, timeout=min(wait, 30.0))
+    now = data_clock()
+    with _air_lock:
+        gen = aircraft.gen; removed = aircraft.removed
+        full = since <= 0 or since > gen or not removed or since < removed[0][0] - 1
+        upsert = {a.hex: ac_json(a, now) for a in aircraft.order if full or a.gen > since}
+        gone = [] if full else [hx for g, hxs in removed if g > since for hx in hxs if hx not in aircraft.recs]
+    return {"now": now, "gen": gen, "full": full, "aircraft": upsert, "removed": gone}
+
+def trails_json(since=0.0):
+    """Samples newer than `since` for the aircraft on the table.
+
+    Runs on HTTP threads while ingest appends, so each trail is copied with
+    one rows() slice: whole samples, never t/lat/lon from different ones."""
+    out = {}; W = Trail.W
+    for ac in aircraft.snapshot():
+        tr = trail_hist.get(ac.hex)
+        if not tr: continue
+        rows = tr.rows()
+        pts = [[round(rows[i], 2), rows[i+1], rows[i+2]] for i in range(0, len(rows) - len(rows) % W, W) if rows[i] > since]
+        if pts: out[ac.hex] = pts
+    return {"now": data_clock(), "trails": out}
+
+def seed_trails(url):
+    """Load another station's /trails.json into `trail_hist` (tracks we already have are kept)."""
+    try:
+        with urllib.request.urlopen(url, timeout=10.0) as r: data = json_loads(r.read())
+    except (OSError, ValueError):
+        return
+    for hx, rows in data.get("trails", {}).items():
+        if hx in trail_hist or not rows: continue
+        for t, lat, lon in rows[-TRAIL_MAX_POINTS:]: trail_append(hx, t, lat, lon)
+        trail_seen(hx, rows[-1][0])
+
+class StationHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, as HTTPFeed expects
+
+    def send(self, code, body=b"", ctype="application/json", headers=()):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for k, v in headers: self.send_header(k, v)
+        self.end_headers()
+        if body: self.wfile.write(body)
+
+    def do_GET(self):
+        u = urllib.parse.urlsplit(self.path); q = urllib.parse.parse_qs(u.query)
+        def arg(k, d):
+            v = q.get(k)
+            if v is None: return d
+            x = pnum(v[0])
+            if x is None or not abs(x) < math.inf: raise ValueError(k)
+            return x
+        try:
+            if u.path == "/delta.json": since, wait = int(arg("since", 0)), max(0.0, arg("wait", 0.0))
+            elif u.path == "/trails.json": since = arg("since", 0.0)
+        except ValueError as e:
+            return self.send(400, f"bad {e}".encode(), "text/plain")
+        if u.path in ("/data.json", "/data/aircraft.json"):
+            gen, body = served_snapshot(); etag = f'"{gen}"'
+            if self.headers.get("If-None-Match") == etag: return self.send(304, headers=(("ETag", etag),))
+            self.send(200, body, headers=(("ETag", etag), ("Cache-Control", "no-cache")))
+        elif u.path == "/delta.json":
+            self.send(200, _dumps(aircraft_delta(since, wait)))
+        elif u.path == "/trails.json":
+            self.send(200, _dumps(trails_json(since)))
+        elif u.path == "/frame.png" and SERVE_FRAMES:
+            frame = latest_frame("png")
+            if frame is None: return self.send(503, b"no frame yet", "text/plain")
+            self.send(200, frame, "image/png", (("Cache-Control", "no-cache"),))
+        elif u.path == "/frames.mjpg" and SERVE_FRAMES and pygame.image.get_extended():
+            self.stream_mjpeg()
+        else:
+            self.send(404, b"not found", "text/plain")
+
+    def stream_mjpeg(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.send_header("Cache-Control", "no-cache"); self.end_headers()
+        self.close_connection = True
+        last = None
+        try:
+            while not _stop_evt.is_set():
+                frame = latest_frame("jpg", after=last)
+                if frame is None: continue
+                last = _frames["jpg"][0]
+                self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(frame))
+                self.wfile.write(frame + b"\r\n")
+        except OSError:
+            pass
+
+    def log_message(self, *a): pass
+
+def latest_frame(fmt, after=None, timeout=2.0):
+    """Newest encoded frame in `fmt`, waiting for one newer than time `after` if given."""
+    with _frame_cond:
+        _frame_want[fmt] = time.time()
+        _frame_cond.wait_for(lambda: fmt in _frames and (after is None or _frames[fmt][0] > after), timeout=timeout)
+        f = _frames.get(fmt)
+    return None if f is None or (after is not None and f[0] <= after) else f[1]
+
+def render_frames():
+    """Draw the scene off-screen and encode it in every format a viewer asked for recently."""
+    now = time.time()
+    fmts = [f for f, t in _frame_want.items() if now - t < 5.0]
+    if not fmts: return
+    pygame.event.pump()
+    draw_scene()
+    for fmt in fmts:
+        if fmt == "jpg" and not pygame.image.get_extended(): continue
+        buf = io.BytesIO(); pygame.image.save(screen, buf, "frame." + fmt)
+        with _frame_cond:
+            _frames[fmt] = (now, buf.getvalue()); _frame_cond.notify_all()
+
+def serve_main():
+    """Headless: run the ingest pipeline once and serve its output on SERVE_PORT."""
+    set_metrics(METRICS_ON or bool(METRICS_FILE))
+    worker, t = start_ingest()   # before any SDL state exists, see main()
+    if SERVE_FRAMES:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy"); init_display()
+    srv = http.server.ThreadingHTTPServer((SERVE_HOST, SERVE_PORT), StationHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    print(f"ADSB-Station serving on http://{SERVE_HOST}:{srv.server_address[1]}/data.json")
+    try:
+        while not _stop_evt.is_set():
+            if worker: shm_pull(); metrics_tick()
+            if SERVE_FRAMES: render_frames()
+            time.sleep(1.0/SERVE_FPS if SERVE_FRAMES else 0.05 if worker else 0.5)
+    except KeyboardInterrupt:
+        pass
+    srv.shutdown()
+    stop_ingest(worker, t)
 
 # ---------------- Main ----------------
+def start_ingest():
+    """Start the ingest process, or the background polling thread; returns (worker, thread)."""
+    worker = start_worker() if WORKER_PROCESS and not REPLAY_FILE else None
+    t = None
+    if worker is None:
+        t = threading.Thread(target=ingest_loop, daemon=True)
+        t.start()
+    return worker, t
+
+def stop_ingest(worker, t):
+    if worker: stop_worker(worker)
+    else:
+        _stop_evt.set()
+        t.join(timeout=5.0)
+
 def main():
     running = True
+    set_metrics(METRICS_ON or bool(METRICS_FILE))
+    # fork the worker first so it never inherits the display, fonts or SDL threads
+    worker, t = start_ingest()
+    init_display()
 
-    # start the background polling thread
-    t = threading.Thread(target=_poll_loop, daemon=True)
-    t.start()
-
+    full = True; seen_gen = None; seen_clock = None; seen_fade = None
+    last_change = time.time(); last_dr = 0.0
     while running:
         for e in pygame.event.get():
             if e.type == pygame.QUIT:
                 running = False
             elif e.type == pygame.KEYDOWN:
-                handle_key(e.key)
+                handle_key(e.key); full = True
+            elif e.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWSHOWN):
+                full = True
 
         # no blocking fetch here anymore
-        draw_scene()
-        pygame.display.flip()
-        clock.tick(FPS)
+        if worker: shm_pull(); metrics_tick()
+        now = time.time()
+        if not DIRTY_RECTS:
+            draw_scene(); present()
+            startup.setdefault("first_frame", (time.perf_counter() - _T0)*1e3)
+            clock.tick(FPS)
+            continue
+        dirty = set()
+        if aircraft.gen != seen_gen:
+            seen_gen = aircraft.gen; dirty.update(("radar","table","bottom"))
+        stamp = time.strftime('%H:%M:%S', time.localtime(data_clock()))
+        if stamp != seen_clock:
+            seen_clock = stamp; dirty.add("top")
+            if hud_on: dirty.add("radar")
+        fade = trail_fade_epoch(data_clock())
+        if fade != seen_fade:
+            seen_fade = fade; dirty.add("radar")
+        moving = dr_moving(data_clock())
+        dr_only = False
+        if moving and "radar" not in dirty and now - last_dr >= 0.9/DR_FPS:   # slack for tick jitter
+            dirty.add("radar"); dr_only = True
+        if "radar" in dirty: last_dr = now
+        if full:
+            draw_scene(); present()
+            full = False; last_change = now
+            startup.setdefault("first_frame", (time.perf_counter() - _T0)*1e3)
+        elif dirty:
+            present(draw_scene(dirty))
+            if dirty != {"top"} and not dr_only: last_change = now
+        clock.tick(FPS if now - last_change < IDLE_AFTER_SEC else max(IDLE_FPS, DR_FPS) if moving else IDLE_FPS)
 
     # stop background thread cleanly
-    _stop_evt.set()
-    t.join(timeout=1.0)
+    stop_ingest(worker, t)
     pygame.quit()
 
 
 if __name__=="__main__":
-    main()
+    serve_main() if SERVE_PORT else main()
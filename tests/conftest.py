@@ -0,0 +1,22 @@
+import os, importlib.util
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="session")
+def station():
+    """ADSB-Station.py imported as a module (its file name is not importable); no display is opened."""
+    spec = importlib.util.spec_from_file_location("adsb_station", os.path.join(ROOT, "ADSB-Station.py"))
+    m = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(m)
+    return m
+
+@pytest.fixture(scope="session")
+def display(station):
+    """The station with its (dummy) display and fonts initialised, once per session."""
+    station.init_display()
+    return station
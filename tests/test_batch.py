@@ -0,0 +1,47 @@
+import math, random
+import pytest
+
+def _points(st, n, seed=1):
+    rnd = random.Random(seed)
+    lats = [st.SITE_LAT + rnd.uniform(-3, 3) for _ in range(n)]
+    lons = [st.SITE_LON + rnd.uniform(-3, 3) for _ in range(n)]
+    lats[1] = None; lons[2] = None; lats[3] = math.nan; lons[4] = math.nan
+    lats[5], lons[5] = st.SITE_LAT, st.SITE_LON   # the site itself: range 0
+    return lats, lons
+
+def _same(a, b):
+    if a is None or b is None: return a is b
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+@pytest.fixture(params=["numpy", "scalar"])
+def batch(request, station, monkeypatch):
+    if request.param == "numpy":
+        if station.np is None: pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(station, "np", None)
+    return station
+
+@pytest.mark.parametrize("extra", [-1, 0, 1, 40])
+def test_range_brg_matches_scalar(batch, extra):
+    n = max(6, batch.BATCH_MIN + extra)
+    lats, lons = _points(batch, n)
+    got = batch.batch_range_brg(lats, lons)
+    assert len(got) == n
+    for la, lo, (r, b) in zip(lats, lons, got):
+        er, eb = batch.ll_to_range_brg(la, lo)
+        assert _same(r, er) and _same(b, eb), (la, lo)
+    assert got[1] == (None, None) and got[3] == (None, None) and got[4] == (None, None)
+
+@pytest.mark.parametrize("extra", [-1, 0, 1, 40])
+def test_rb_to_px_matches_scalar(batch, extra):
+    batch.radius_px = 400
+    n = max(6, batch.BATCH_MIN + extra)
+    rnd = random.Random(2)
+    rbs = [(rnd.uniform(0, 60), rnd.uniform(0, 360)) for _ in range(n)]
+    rbs[0] = (None, None); rbs[1] = (10.0, None); rbs[2] = (math.nan, 45.0)
+    rbs[3] = (32.0, 90.0); rbs[4] = (32.0001, 90.0)   # exactly on and just past the edge
+    rbs[5] = (0.0, 0.0)
+    got = batch.batch_rb_to_px(rbs, 32, 500, 400)
+    assert got == [batch._rb_to_px(p, 32, 500, 400) for p in rbs]
+    assert got[0] is None and got[1] is None and got[2] is None
+    assert got[3] == (900, 400) and got[4] is None and got[5] == (500, 400)
@@ -0,0 +1,69 @@
+import json, threading, time, http.server
+import pytest
+
+def serve(snapshot, delay):
+    """Local data.json server; `delay()` gives the seconds to stall before each answer."""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay())
+            body = json.dumps(snapshot()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers(); self.wfile.write(body)
+        def log_message(self, *a): pass
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}/data.json"
+
+@pytest.fixture
+def feeds(station, monkeypatch):
+    for name, v in (("feed_stats", {}), ("_feed_busy", {}), ("_feed_last", {}), ("_feed_slow", set()),
+                    ("_feed_used", None), ("_http_feeds", {}), ("_feed_pool", None)):
+        monkeypatch.setattr(station, name, v)
+    monkeypatch.setattr(station, "FEED_TIMEOUT", 0.3)
+    servers = []
+    yield servers
+    for srv in servers: srv.shutdown()
+
+def test_hung_feed_is_held_and_not_waited_on(station, feeds):
+    clock = {"t": 0}
+    def snap(hx):
+        return lambda: {"now": clock["t"], "aircraft": [{"hex": hx, "lat": 52.0, "lon": 4.0, "seen_pos": 0.1}]}
+    hang = {"on": False}
+    fast, fast_url = serve(snap("aaaaaa"), lambda: 0.0)
+    slow, slow_url = serve(snap("bbbbbb"), lambda: 2.0 if hang["on"] else 0.0)
+    feeds += [fast, slow]
+    urls = [fast_url, slow_url]
+
+    merged = station.fetch_feeds(urls)
+    assert {it["hex"] for it in merged} == {"aaaaaa", "bbbbbb"}
+
+    hang["on"] = True
+    times = []
+    for _ in range(4):
+        clock["t"] += 1
+        t0 = time.perf_counter(); merged = station.fetch_feeds(urls); times.append(time.perf_counter() - t0)
+        assert merged is not None and {it["hex"] for it in merged} == {"aaaaaa", "bbbbbb"}
+    assert times[0] >= 0.25                       # the first miss costs one FEED_TIMEOUT
+    assert max(times[1:]) < 0.2                   # after that the hung feed is not waited on
+    assert station.feed_stats[slow_url]["timeouts"] + station.feed_stats[slow_url]["errors"] >= 1
+
+def test_held_snapshot_expires(station, feeds, monkeypatch):
+    monkeypatch.setattr(station, "FEED_HOLD_SEC", 0.0)
+    hang = {"on": False}
+    fast, fast_url = serve(lambda: {"now": time.time(), "aircraft": [{"hex": "aaaaaa"}]}, lambda: 0.0)
+    slow, slow_url = serve(lambda: {"now": time.time(), "aircraft": [{"hex": "bbbbbb"}]},
+                           lambda: 2.0 if hang["on"] else 0.0)
+    feeds += [fast, slow]
+    station.fetch_feeds([fast_url, slow_url])
+    hang["on"] = True; time.sleep(0.01)
+    merged = station.fetch_feeds([fast_url, slow_url])
+    assert {it["hex"] for it in merged} == {"aaaaaa"}
+
+def test_merge_prefers_fresher_feed_after_hold_age(station):
+    a = {"aircraft": [{"hex": "abc", "lat": 1.0, "lon": 1.0, "seen_pos": 1.0}]}
+    b = {"aircraft": [{"hex": "abc", "lat": 2.0, "lon": 2.0, "seen_pos": 0.5}]}
+    assert station.merge_feeds([a, b])[0]["lat"] == 2.0
+    assert station.merge_feeds([a, b], [0.0, 3.0])[0]["lat"] == 1.0   # b's snapshot arrived 3 s ago
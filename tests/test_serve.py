@@ -0,0 +1,66 @@
+import collections, http.client, http.server, json, threading, time
+
+import pytest
+
+def test_trails_json_rows_stay_whole_under_appends(station, monkeypatch):
+    monkeypatch.setattr(station, "aircraft", station.AircraftTable())
+    monkeypatch.setattr(station, "trail_hist", {})
+    monkeypatch.setattr(station, "last_seen", collections.OrderedDict())
+    monkeypatch.setattr(station, "TRAIL_MAX_POINTS", 50)
+    station.aircraft.update([("abc123",) + (None,)*9 + (False,)])
+    # lat and lon both encode t, so a torn sample is detectable
+    for i in range(60): station.trail_append("abc123", float(i), float(i), float(i), (1.0, 0.0))
+    stop = threading.Event()
+    def writer():
+        i = 60
+        while not stop.is_set():
+            station.trail_append("abc123", float(i), float(i), float(i), (1.0, 0.0)); i += 1
+    t = threading.Thread(target=writer); t.start()
+    try:
+        for _ in range(300):
+            for t_, lat, lon in station.trails_json(10.0)["trails"]["abc123"]:
+                assert t_ == lat == lon and t_ > 10.0
+    finally:
+        stop.set(); t.join()
+
+
+def test_update_swaps_whole_records(station, monkeypatch):
+    table = station.AircraftTable()
+    row = ("abc123", "TEST1", 1000, 200, 90.0, 1.0, 2.0, "1200", 5.0, 90.0, False)
+    table.update([row], now=100.0)
+    held = table.snapshot()[0]
+    table.update([row[:2] + (2000, 250) + row[4:]], now=101.0)
+    new = table.snapshot()[0]
+    assert new is not held and (held.alt_show, held.spd_show) == (1000, 200)
+    assert (new.alt_show, new.spd_show) == (2000, 250) and new.fix_t == held.fix_t
+    table.update([row[:2] + (2000, 250) + row[4:]], now=102.0)
+    assert table.snapshot()[0] is new
+
+
+@pytest.fixture
+def server(station, monkeypatch):
+    monkeypatch.setattr(station, "aircraft", station.AircraftTable())
+    monkeypatch.setattr(station, "trail_hist", {})
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), station.StationHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True).start()
+    def get(path):
+        conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=5)
+        conn.request("GET", path); r = conn.getresponse()
+        return r.status, r.read()
+    yield get
+    srv.shutdown(); srv.server_close()
+
+
+@pytest.mark.parametrize("path", ["/delta.json?since=1e400", "/delta.json?since=inf", "/delta.json?since=abc",
+                                  "/delta.json?since=1&wait=-inf", "/trails.json?since=nan", "/trails.json?since=1e400"])
+def test_bad_query_is_400(server, path):
+    assert server(path)[0] == 400
+
+
+def test_delta_ahead_of_server_returns_full_at_once(station, server):
+    station.aircraft.update([("abc123",) + (None,)*9 + (False,)])
+    t = time.monotonic()
+    status, body = server("/delta.json?since=500&wait=10")
+    delta = json.loads(body)
+    assert status == 200 and delta["full"] and "abc123" in delta["aircraft"] and time.monotonic() - t < 2.0
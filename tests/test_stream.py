@@ -0,0 +1,144 @@
+import collections, socket, threading, time
+import pytest
+
+# Reference DF17 messages ("The 1090 Megahertz Riddle")
+IDENT = "8D4840D6202CC371C32CE0576098"        # 4840d6 KLM1023
+POS_EVEN = "8D40621D58C382D690C8AC2863A7"     # 40621d, with POS_ODD: 52.2572 N 3.9194 E (even latest)
+POS_ODD = "8D40621D58C386435CC412692AD6"
+VELOCITY = "8D485020994409940838175B284F"     # 485020 159.2 kt 182.88 deg
+
+def beast(msg_hex, clock=b"\x1a\x00\x00\x00\x00\x1a"):
+    """One Beast Mode S frame; the default clock puts escaped 0x1a bytes in the frame."""
+    msg = bytes.fromhex(msg_hex)
+    body = clock + b"\x80" + msg
+    return (b"\x1a\x33" if len(msg) == 14 else b"\x1a\x32") + body.replace(b"\x1a", b"\x1a\x1a")
+
+def df5(icao, id13):
+    head = ((5 << 27) | id13).to_bytes(4, "big")
+    return bytes(head + (_crc(head) ^ icao).to_bytes(3, "big")).hex()
+
+def _crc(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000: crc ^= 0x1FFF409
+    return crc & 0xFFFFFF
+
+class ReplayServer:
+    """Local TCP server: connection i is sent sessions[i] chunk by chunk, then closed."""
+
+    def __init__(self, sessions, gap=0.02):
+        self.sessions = list(sessions); self.gap = gap; self.connections = 0
+        self.sock = socket.socket(); self.sock.bind(("127.0.0.1", 0)); self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while self.sessions:
+            try: conn, _ = self.sock.accept()
+            except OSError: return
+            self.connections += 1
+            with conn:
+                for chunk in self.sessions.pop(0):
+                    conn.sendall(chunk); time.sleep(self.gap)
+                time.sleep(0.1)
+
+    def close(self): self.sock.close()
+
+@pytest.fixture
+def stream(station, monkeypatch):
+    """Runs _stream_loop against a ReplayServer with fresh aircraft/trail state."""
+    monkeypatch.setattr(station, "aircraft", station.AircraftTable())
+    monkeypatch.setattr(station, "trail_hist", {})
+    monkeypatch.setattr(station, "last_seen", collections.OrderedDict())
+    monkeypatch.setattr(station, "_stop_evt", threading.Event())
+    monkeypatch.setattr(station, "STREAM_HOST", "127.0.0.1")
+    monkeypatch.setattr(station, "STREAM_PUBLISH_SECS", 0.05)
+    monkeypatch.setattr(station, "STREAM_BACKOFF", (0.05, 0.1))
+    started = []
+    def run(ingest, sessions):
+        srv = ReplayServer(sessions)
+        monkeypatch.setattr(station, "INGEST", ingest)
+        monkeypatch.setattr(station, "SBS_PORT" if ingest == "sbs" else "BEAST_PORT", srv.port)
+        t = threading.Thread(target=station._stream_loop, daemon=True); t.start()
+        started.append((srv, t))
+        return srv
+    yield run
+    station._stop_evt.set()
+    for srv, t in started:
+        t.join(timeout=2.0); srv.close()
+
+def wait_for(cond, timeout=3.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.02)
+    return cond()
+
+def test_beast_split_escaped_frames(station, stream):
+    data = beast(IDENT) + beast(POS_ODD) + beast(POS_EVEN) + beast(VELOCITY)
+    bad = bytearray(bytes.fromhex("8D4840D6202CC371C32CE0576098")); bad[0:4] = bytes.fromhex("8DABCDEF")
+    data += beast(bad.hex())                                  # CRC no longer matches
+    data += beast(df5(0x4840D6, 2722)) + beast(df5(0x777777, 2722))
+    # split inside frames, including between the two bytes of an escaped 0x1a
+    cuts = [3, 4, 20, 33, 34, 60, 61, len(data)-5]
+    chunks = [data[a:b] for a, b in zip([0]+cuts, cuts+[len(data)])]
+    assert b"".join(chunks) == data and chunks[1] == b"\x1a"
+    stream("beast", [chunks])
+    recs = lambda: station.aircraft.recs
+    assert wait_for(lambda: {"4840d6", "40621d", "485020"} <= set(recs()))
+    assert wait_for(lambda: recs()["4840d6"].squawk == "7500")
+    assert recs()["4840d6"].flight == "KLM1023"
+    pos = recs()["40621d"]
+    assert pos.lat == pytest.approx(52.2572, abs=1e-4) and pos.lon == pytest.approx(3.91937, abs=1e-4)
+    assert pos.alt_show == "38000"
+    vel = recs()["485020"]
+    assert vel.spd_show == "159" and vel.track == pytest.approx(182.88, abs=0.01)
+    assert "abcdef" not in recs() and "777777" not in recs()   # bad CRC; DF5 for an unknown address
+
+def test_cpr_global_and_local(station):
+    dec = station.BeastDecoder({})
+    dec.feed(beast(POS_EVEN) + beast(POS_ODD), 100.0)          # odd latest
+    st = dec.states["40621d"]
+    assert (st["lat"], st["lon"]) == pytest.approx((52.26578, 3.93891), abs=1e-4)
+    dec.feed(beast(POS_EVEN), 200.0)                           # pair too old: local decode
+    assert (st["lat"], st["lon"]) == pytest.approx((52.2572, 3.91937), abs=1e-4)
+    lat, lon = station.cpr_local((93000/131072, 51372/131072), 0, 52.258, 3.918)
+    assert (lat, lon) == pytest.approx((52.2572, 3.91937), abs=1e-4)
+
+def test_publish_expires_cpr_pairs(station, monkeypatch):
+    monkeypatch.setattr(station, "aircraft", station.AircraftTable())
+    monkeypatch.setattr(station, "trail_hist", {})
+    monkeypatch.setattr(station, "last_seen", collections.OrderedDict())
+    dec = station.BeastDecoder({})
+    dec.feed(beast(POS_EVEN) + beast(POS_ODD), 100.0)
+    dec.feed(beast(VELOCITY), 101.0 + station.STREAM_STALE_SECS)
+    station.stream_publish(dec, 101.0 + station.STREAM_STALE_SECS)
+    assert set(dec.states) == {"485020"} and "40621d" not in dec.cpr
+
+def test_sbs_split_lines(station, stream):
+    text = (b"MSG,1,1,1,4840D6,1,,,,,KLM1023 ,,,,,,,,,,,\n"
+            b"MSG,3,1,1,4840D6,1,,,,,,38000,,,52.2572,3.91937,,,,,,0\n"
+            b"MSG,4,1,1,4840D6,1,,,,,,,159,182.9,,,,,,,,\n"
+            b"MSG,6,1,1,4840D6,1,,,,,,,,,,,,7500,,,,\n"
+            b"MSG,3,1,1,AAAAAA,1,,,,,,0,,,52.0,4.0,,,,,,-1\n"
+            b"STA,1,1,1,BBBBBB,1\n")
+    chunks = [text[:17], text[17:90], text[90:91], text[91:]]
+    stream("sbs", [chunks])
+    recs = lambda: station.aircraft.recs
+    assert wait_for(lambda: "4840d6" in recs() and recs()["4840d6"].squawk == "7500")
+    ac = recs()["4840d6"]
+    assert (ac.flight, ac.alt_show, ac.spd_show) == ("KLM1023", "38000", "159")
+    assert (ac.lat, ac.lon, ac.track) == (52.2572, 3.91937, 182.9)
+    assert recs()["aaaaaa"].alt_show is None                   # on the ground
+    assert "bbbbbb" not in recs()
+
+def test_reconnect_after_close(station, stream):
+    first = [b"MSG,3,1,1,111111,1,,,,,,1000,,,52.0,4.0,,,,,,0\n"]
+    second = [b"MSG,3,1,1,222222,1,,,,,,2000,,,52.1,4.1,,,,,,0\n"]
+    srv = stream("sbs", [first, second])
+    assert wait_for(lambda: "222222" in station.aircraft.recs)
+    assert srv.connections == 2
+    assert "111111" in station.aircraft.recs                   # state survives the reconnect
@@ -0,0 +1,67 @@
+import collections, random, sys, threading
+
+
+def _row(hx, lat, lon):
+    return {"hex": hx, "lat": lat, "lon": lon, "track": 90.0, "gs": 300, "alt_baro": 30000}
+
+
+def test_trail_layer_rebuilds_only_for_departures(display, monkeypatch):
+    station = display
+    for name, value in (("aircraft", station.AircraftTable()), ("trail_hist", {}),
+                        ("last_seen", collections.OrderedDict()), ("_trail_px", {}), ("_trail_drawn", {})):
+        monkeypatch.setattr(station, name, value)
+    monkeypatch.setattr(station, "_trail_dirty", True)
+    monkeypatch.setattr(station, "DEAD_RECKON", False)
+    now = [1000.0]
+    monkeypatch.setattr(station, "data_clock", lambda: now[0])
+    full = []
+    orig = station._draw_trail
+    monkeypatch.setattr(station, "_draw_trail", lambda hx, after, t: (after is None and full.append(hx), orig(hx, after, t)))
+    lat, lon = station.SITE_LAT, station.SITE_LON
+
+    def poll(rows):
+        now[0] += 5.0
+        station.preprocess(rows, now[0])
+        for _ in range(3): station.draw_scene()
+
+    for i in range(3):
+        poll([_row("aaa001", lat + 0.05*i, lon), _row("aaa002", lat, lon + 0.05*i)])
+    assert sorted(full) == ["aaa001", "aaa002"]
+    # aaa002 has no position this poll: its trail stays on the layer
+    poll([_row("aaa001", lat + 0.2, lon), _row("aaa002", None, None)])
+    assert sorted(full) == ["aaa001", "aaa002"]
+    # aaa002 leaves the feed: one rebuild, which redraws only the trail still there
+    poll([_row("aaa001", lat + 0.25, lon)])
+    assert sorted(full) == ["aaa001", "aaa001", "aaa002"] and set(station._trail_drawn) == {"aaa001"}
+
+
+def test_trail_points_cache_survives_concurrent_appends(display, monkeypatch):
+    station = display
+    monkeypatch.setattr(station, "trail_hist", {})
+    monkeypatch.setattr(station, "_trail_px", {})
+    monkeypatch.setattr(station, "TRAIL_MAX_POINTS", 400)
+    rng = random.Random(5)
+    tr = station.trail_hist["abc123"] = station.Trail()
+    t = [0.0]
+
+    def add():
+        t[0] += 1.0
+        tr.append(t[0], 0.0, 0.0, rng.uniform(0, 40), rng.uniform(0, 360))
+
+    for _ in range(50): add()
+    stop = threading.Event()
+
+    def writer():
+        for _ in range(3000):
+            if stop.is_set(): break
+            add()
+
+    interval = sys.getswitchinterval(); sys.setswitchinterval(1e-6)   # interleave as finely as possible
+    w = threading.Thread(target=writer); w.start()
+    try:
+        while w.is_alive(): station.trail_points("abc123")
+    finally:
+        stop.set(); w.join(); sys.setswitchinterval(interval)
+    seqs, pts = station.trail_points("abc123")
+    station._trail_px.clear()
+    assert station.trail_points("abc123") == (seqs, pts)
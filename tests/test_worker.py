@@ -0,0 +1,50 @@
+import importlib.util, os, random
+from multiprocessing import shared_memory
+
+import pytest
+
+from conftest import ROOT
+
+
+def _load(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, "ADSB-Station.py"))
+    m = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(m)
+    return m
+
+
+@pytest.fixture
+def pair():
+    """Two station instances, one standing in for the worker and one for the render side, sharing one block."""
+    w, p = _load("adsb_worker"), _load("adsb_parent")
+    shm = shared_memory.SharedMemory(create=True, size=w._SHM_BASE + 2*w._SHM_BUF)
+    shm.buf[:w._SHM_BASE] = bytes(w._SHM_BASE)
+    w._shm = p._shm = shm
+    yield w, p
+    shm.close(); shm.unlink()
+
+
+def test_shm_pull_mirrors_worker(pair):
+    w, p = pair
+    rng = random.Random(3)
+    acs = [{"hex": f"{0xa00000+i:06x}", "flight": f"T{i}", "lat": w.SITE_LAT + rng.uniform(-1, 1),
+            "lon": w.SITE_LON + rng.uniform(-1, 1), "track": rng.uniform(0, 360), "gs": 300, "alt_baro": 30000}
+           for i in range(40)]
+    now = 1000.0
+    for step in range(30):
+        now += 1.0
+        for a in acs[step % 2::2]:   # half the fleet moves each poll
+            a["lat"] += 0.01; a["lon"] += 0.01
+        if step == 20: acs.pop(0)
+        w.shm_publish(w._shm, w.preprocess([dict(a) for a in acs], now))
+        held = {a.hex: a for a in p.aircraft.snapshot()}
+        assert p.shm_pull()
+        mine, theirs = p.aircraft.snapshot(), w.aircraft.snapshot()
+        assert [a.hex for a in mine] == [a.hex for a in theirs] and p.aircraft.gen == w.aircraft.gen
+        for a, b in zip(mine, theirs):
+            assert (a.gen, a.alt_show, a.lat, a.x, a.vx, a.fix_t) == (b.gen, b.alt_show, b.lat, b.x, b.vx, b.fix_t)
+            if a.hex in held and held[a.hex].gen == a.gen: assert held[a.hex] is a   # unchanged: kept
+        assert set(p.trail_hist) == {a.hex for a in theirs if a.hex in w.trail_hist}   # the mirror keeps only live tracks
+        for hx, tr in p.trail_hist.items():
+            assert tr.seq == w.trail_hist[hx].seq and tr.rows().tolist() == w.trail_hist[hx].rows(len(tr)).tolist()
+        assert p.trail_mem["bytes"] == sum(tr.nbytes() for tr in p.trail_hist.values())